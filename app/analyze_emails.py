@@ -36,6 +36,12 @@ def load_email_logs(log_file):
     df['relevance_pct'] = (df['included_links_count'] / df['total_links']) * 100
     
     print(f"Loaded {len(df)} emails. Avg relevance: {df['relevance_pct'].mean():.1f}%")
+    # Latency metrics are only present for emails logged after streaming was added
+    if 'total_time' in df and df['total_time'].notna().any():
+        print(f"Avg total time: {df['total_time'].mean():.2f}s")
+    # Only streamed emails have a first-token time
+    if 'time_to_first_token' in df and df['time_to_first_token'].notna().any():
+        print(f"Avg time to first token (streamed emails): {df['time_to_first_token'].mean():.2f}s")
     return df
 
 # Generate bar chart: % emails by number of links included
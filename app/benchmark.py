@@ -0,0 +1,365 @@
+import argparse
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SEED_CACHE = os.path.join(APP_DIR, 'data', 'jobs_cache.json')
+PORTFOLIO_CSV = os.path.join(APP_DIR, 'resource', 'portfolio.csv')
+OUTPUT_JSON = 'app/data/benchmark_results.json'
+
+# Extra search terms used by scrape_company_jobs, mapped back to the cached company
+SEARCH_TERM_ALIASES = {"Walmart Global Tech": "Walmart", "Amazon Web Services": "Amazon", "Google": "Alphabet"}
+
+FAKE_SKILLS = ["Python", "AWS", "Docker", "SQL", "React", "Kubernetes", "Java", "Machine Learning", "Agile", "Communication"]
+
+
+# Deterministic chat model: answers the extraction, skills and email prompts with canned output after a fixed latency
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.05
+    token_latency: float = 0.0
+    # Number of LLM requests served (invoke or stream)
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-benchmark"
+
+    def _respond(self, prompt):
+        seed = zlib.crc32(prompt.encode('utf-8'))
+        skills = [FAKE_SKILLS[(seed + i) % len(FAKE_SKILLS)] for i in range(6)]
+        if "### SCRAPED TEXT FROM WEBSITE:" in prompt:
+            return json.dumps([{"role": "Software Engineer", "experience": "3+ years", "skills": skills, "description": prompt[:300]}])
+        if "### EMAIL (NO PREAMBLE):" in prompt:
+            links = re.findall(r'^\s*[12]\. (\S+)\s*$', prompt, flags=re.MULTILINE)
+            link_text = " and ".join(links) if links else "our portfolio"
+            return (f"Dear Hiring Manager,\n\nYour team needs {', '.join(skills[:3])} expertise. "
+                    f"GunnenAI has delivered exactly that, as shown in {link_text}. Let's chat?\n\nBest,\nJay\nBDE, GunnenAI")
+        return json.dumps(skills)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        content = self._respond("\n".join(str(m.content) for m in messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        content = self._respond("\n".join(str(m.content) for m in messages))
+        for token in re.findall(r'\S+\s*', content):
+            if self.token_latency:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+# Minimal SMTP sink that accepts and counts messages without TLS or auth
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + "\r\n").encode('ascii'))
+
+    def handle(self):
+        self._reply("220 localhost benchmark sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', errors='replace').strip().upper()
+            if command.startswith("EHLO"):
+                self._reply("250-localhost")
+                self._reply("250 8BITMIME")
+            elif command.startswith("DATA"):
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.messages += 1
+                self._reply("250 OK")
+            elif command.startswith("QUIT"):
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPSinkHandler)
+        self.messages = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+# Stubbed jobspy.scrape_jobs that serves postings from the committed jobs cache
+def make_fake_scrape_jobs(seed_jobs):
+    def fake_scrape_jobs(site_name=None, search_term=None, **kwargs):
+        company = SEARCH_TERM_ALIASES.get(search_term, search_term)
+        return pd.DataFrame(seed_jobs.get(company, []))
+    return fake_scrape_jobs
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    # Nearest-rank percentile
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+# Collects per-call latencies for each pipeline stage
+class StageTimer:
+    def __init__(self):
+        self.stages = {}
+
+    def time(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._stage(stage)['latencies'].append(time.perf_counter() - start)
+
+    def _stage(self, stage):
+        return self.stages.setdefault(stage, {'latencies': [], 'items': 0})
+
+    def add_items(self, stage, count):
+        self._stage(stage)['items'] += count
+
+    # Stages with no timed calls (e.g. an empty sample) still get an entry
+    def mark_rss(self, stage):
+        self._stage(stage)['peak_rss_mb'] = peak_rss_mb()
+
+    def report(self):
+        report = {}
+        for stage, data in self.stages.items():
+            latencies = data['latencies']
+            total = sum(latencies)
+            p50 = percentile(latencies, 50)
+            p99 = percentile(latencies, 99)
+            items = data['items'] or len(latencies)
+            report[stage] = {
+                'calls': len(latencies),
+                'items': items,
+                'total_s': round(total, 4),
+                'throughput_per_s': round(items / total, 2) if total else None,
+                'p50_ms': round(p50 * 1000, 3) if p50 is not None else None,
+                'p99_ms': round(p99 * 1000, 3) if p99 is not None else None,
+                'peak_rss_mb': data.get('peak_rss_mb')
+            }
+        return report
+
+
+# Compare a UI rerun on the JSON cache (full parse) with the job store (titles only, then one lazy description)
+def run_cache_load_benchmark(repeats=5):
+    import job_store
+
+    workdir = tempfile.mkdtemp(prefix='cold_email_cache_bench_')
+    original_cwd = os.getcwd()
+    os.makedirs(os.path.join(workdir, 'app', 'data'))
+    json_path = os.path.join(workdir, 'app', 'data', 'jobs_cache.json')
+    db_path = os.path.join(workdir, 'app', 'data', 'jobs_cache.db')
+    shutil.copy(SEED_CACHE, json_path)
+    os.chdir(workdir)
+    try:
+        timer = StageTimer()
+        timer.time('migrate_json', job_store.migrate_json, json_path, db_path)
+
+        def json_rerun():
+            with open(json_path, 'r') as f:
+                jobs_cache = json.load(f)
+            company = next(name for name, jobs in jobs_cache.items() if jobs)
+            titles = [job['title'] for job in jobs_cache[company]]
+            return next(job for job in jobs_cache[company] if job['title'] == titles[0])
+
+        def store_rerun():
+            companies = job_store.load_companies(db_path)
+            company = next(name for name in companies if job_store.load_job_titles(name, db_path))
+            titles = job_store.load_job_titles(company, db_path)
+            return job_store.load_job(titles[0][0], db_path)
+
+        for _ in range(repeats):
+            timer.time('json_rerun', json_rerun)
+            timer.time('store_rerun', store_rerun)
+        report = timer.report()
+        report['json_bytes'] = os.path.getsize(json_path)
+        report['store_bytes'] = os.path.getsize(db_path)
+        return report
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# Local skill extraction over the whole seed cache: throughput and how often the LLM fallback would fire
+def run_skill_benchmark():
+    from skills import SkillExtractor
+
+    with open(SEED_CACHE, 'r') as f:
+        seed_jobs = json.load(f)
+    descriptions = [job.get('description') or '' for jobs in seed_jobs.values() for job in jobs]
+    extractor = SkillExtractor(portfolio_csv=PORTFOLIO_CSV)
+    start = time.perf_counter()
+    results = [extractor.extract(description) for description in descriptions]
+    elapsed = time.perf_counter() - start
+    fallbacks = sum(1 for _, confidence in results if confidence < extractor.min_confidence)
+    return {
+        'jobs': len(descriptions),
+        'jobs_per_s': round(len(descriptions) / elapsed, 1),
+        'avg_confidence': round(sum(confidence for _, confidence in results) / len(results), 3),
+        'llm_fallback_rate': round(fallbacks / len(results), 3)
+    }
+
+
+def run_benchmark(num_companies=5, num_jobs=20, llm_latency=0.05, token_latency=0.0, seed=0):
+    with open(SEED_CACHE, 'r') as f:
+        seed_jobs = json.load(f)
+    companies = [name for name, jobs in seed_jobs.items() if jobs][:num_companies]
+
+    # Run inside a scratch directory so the app's relative 'app/...' paths never touch real logs, caches or vector stores
+    workdir = tempfile.mkdtemp(prefix='cold_email_bench_')
+    original_cwd = os.getcwd()
+    os.makedirs(os.path.join(workdir, 'app', 'data'))
+    os.makedirs(os.path.join(workdir, 'app', 'resource'))
+    shutil.copy(PORTFOLIO_CSV, os.path.join(workdir, 'app', 'resource', 'portfolio.csv'))
+    with open(os.path.join(workdir, 'app', 'data', 'companies.json'), 'w') as f:
+        json.dump({'companies': [{'name': name, 'search_term': name} for name in companies]}, f)
+
+    import scraper
+    from preprocess import preprocess_and_embed
+    from portfolio import Portfolio, format_portfolio_links
+    from chains import Chain
+    from mailer import send_email
+    from utils import sanitize_text
+    from skills import SkillExtractor, resolve_skills
+
+    timer = StageTimer()
+    sink = SMTPSink()
+    original_scrape_jobs = scraper.scrape_jobs
+    original_scrape_company_jobs = scraper.scrape_company_jobs
+    scraper.scrape_jobs = make_fake_scrape_jobs(seed_jobs)
+    scraper.scrape_company_jobs = lambda name, *args, **kwargs: timer.time('scrape', original_scrape_company_jobs, name, *args, **kwargs)
+    os.chdir(workdir)
+    try:
+        all_jobs = scraper.batch_scrape(companies_file='app/data/companies.json', batch_size=10, delay=0)
+        timer.add_items('scrape', sum(len(jobs) for jobs in all_jobs.values()))
+        timer.mark_rss('scrape')
+
+        indexing = timer.time('embed', preprocess_and_embed, jobs_file='app/data/jobs_cache.db', persist_dir='chroma_jobs_db')
+        timer.add_items('embed', sum(len(jobs) for jobs in all_jobs.values()))
+        timer.mark_rss('embed')
+
+        flat_jobs = [dict(job, company=company) for company, jobs in all_jobs.items() for job in jobs]
+        sample = random.Random(seed).sample(flat_jobs, min(num_jobs, len(flat_jobs)))
+
+        chain = Chain(llm=FakeChatModel(latency=llm_latency, token_latency=token_latency))
+        portfolio = Portfolio(file_path='app/resource/portfolio.csv')
+        portfolio.load_portfolio()
+
+        for job in sample:
+            timer.time('extract_jobs', chain.extract_jobs, sanitize_text(job.get('description', '')))
+        timer.mark_rss('extract_jobs')
+
+        # Skills the way the batch view used to get them: extract_jobs on the description, plus the skills prompt when that came back empty
+        def baseline_skills(description):
+            extracted = chain.extract_jobs(sanitize_text(description))
+            skills = extracted[0].get('skills', []) if extracted else []
+            return skills or chain.extract_skills(sanitize_text(description))
+
+        calls_before = chain.llm.calls
+        for job in sample:
+            timer.time('skills_baseline', baseline_skills, job.get('description', ''))
+        baseline_calls = chain.llm.calls - calls_before
+        timer.mark_rss('skills_baseline')
+
+        # Skills as the UI now resolves them: local dictionary first, LLM only on low coverage
+        skill_extractor = SkillExtractor(portfolio_csv='app/resource/portfolio.csv')
+        extracted = []
+        calls_before = chain.llm.calls
+        for job in sample:
+            skills, _, _ = timer.time('resolve_skills', resolve_skills, skill_extractor, chain, job.get('description', ''))
+            extracted.append(skills)
+        resolve_calls = chain.llm.calls - calls_before
+        timer.mark_rss('resolve_skills')
+
+        links_per_job = []
+        for job, skills in zip(sample, extracted):
+            portfolio_links = timer.time('query_links', portfolio.query_links, skills, job.get('description', ''))
+            links_per_job.append(format_portfolio_links(portfolio_links))
+        timer.mark_rss('query_links')
+
+        emails = []
+        for job, skills, links in zip(sample, extracted, links_per_job):
+            emails.append(timer.time('generate_mail', chain.generate_mail, job=job, links=links, skills=skills))
+        timer.mark_rss('generate_mail')
+
+        for job, body in zip(sample, emails):
+            result = timer.time('send_email', send_email, 'dummyrecruiting@example.com', f"Benchmark - {job['title']}", body,
+                                smtp_host='127.0.0.1', smtp_port=sink.server_address[1], use_tls=False)
+            if result != "Email sent successfully!":
+                raise RuntimeError(result)
+        timer.mark_rss('send_email')
+    finally:
+        os.chdir(original_cwd)
+        scraper.scrape_jobs = original_scrape_jobs
+        scraper.scrape_company_jobs = original_scrape_company_jobs
+        sink.shutdown()
+        sink.server_close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'config': {'companies': len(companies), 'jobs': len(sample), 'llm_latency_s': llm_latency,
+                   'token_latency_s': token_latency, 'seed': seed},
+        'stages': timer.report(),
+        'indexing': indexing,
+        'emails_delivered': sink.messages,
+        # Per-job latency for both paths is in stages['skills_baseline'] and stages['resolve_skills']
+        'skill_llm_calls': {'before': baseline_calls, 'after': resolve_calls},
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark (fake jobspy, fake LLM, local SMTP sink)")
+    parser.add_argument('--companies', type=int, default=5, help="Number of cached companies to scrape")
+    parser.add_argument('--jobs', type=int, default=20, help="Number of jobs sent through extraction, generation and sending")
+    parser.add_argument('--llm-latency', type=float, default=0.05, help="Fake LLM latency per call in seconds")
+    parser.add_argument('--token-latency', type=float, default=0.0, help="Fake LLM delay per streamed token in seconds")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=OUTPUT_JSON, help="Where to write the JSON report")
+    parser.add_argument('--cache-load-only', action='store_true', help="Skip the pipeline run; only run the job store and skill extraction benchmarks")
+    args = parser.parse_args()
+
+    results = {} if args.cache_load_only else run_benchmark(args.companies, args.jobs, args.llm_latency, args.token_latency, args.seed)
+    results['cache_load'] = run_cache_load_benchmark()
+    results['skills'] = run_skill_benchmark()
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Benchmark report saved: {args.output}")
@@ -7,13 +7,20 @@ from dotenv import load_dotenv
 import json
 from datetime import datetime
 import re
+import threading
+import time
+from metrics import timed, observe, record_tokens
 
 load_dotenv()
 
+# Serializes appends to email_logs.json from background logging threads
+_email_log_lock = threading.Lock()
+
 class Chain:
-    def __init__(self):
-        self.llm = ChatGroq(temperature=0.1, groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama-3.1-8b-instant")
+    def __init__(self, llm=None):
+        self.llm = llm or ChatGroq(temperature=0.1, groq_api_key=os.getenv("GROQ_API_KEY"), model_name="llama-3.1-8b-instant")
 
+    @timed('extract_jobs')
     def extract_jobs(self, cleaned_text):
         prompt_extract = PromptTemplate.from_template(
         """
@@ -39,6 +46,7 @@ class Chain:
 
         chain_extract = prompt_extract | self.llm
         res = chain_extract.invoke(input={"page_data": cleaned_text})
+        record_tokens('extract_jobs', res)
         try:
             json_parser = JsonOutputParser()
             res = json_parser.parse(res.content)
@@ -50,7 +58,26 @@ class Chain:
                 f.write(f"{datetime.now().isoformat()} - Failed to parse job data from LLM: {res.content[:500]}\n")
             return []
 
-    def generate_mail(self, job, links, skills=None):
+    # LLM fallback for skills when they cannot be found locally
+    @timed('extract_skills')
+    def extract_skills(self, description):
+        prompt_skills_fallback = PromptTemplate.from_template(
+            """
+            Extract a list of 5-10 technical skills and qualifications from this job description: {desc}
+            Return ONLY a JSON array like ["skill1", "skill2"]. No preamble.
+            """
+        )
+        chain_fallback = prompt_skills_fallback | self.llm
+        fallback_res = chain_fallback.invoke({"desc": description})
+        record_tokens('extract_skills', fallback_res)
+        try:
+            json_parser = JsonOutputParser()
+            skills = json_parser.parse(fallback_res.content)
+            return skills if isinstance(skills, list) else []
+        except OutputParserException:
+            return []
+
+    def _mail_inputs(self, job, links, skills=None):
         skills_str = ", ".join(skills) if skills and isinstance(skills, list) else ""
         prompt_email = PromptTemplate.from_template(
             """
@@ -95,20 +122,22 @@ class Chain:
         link1 = links[0] if len(links) >= 1 else ""
         link2 = links[1] if len(links) >= 2 else ""
         link_list = ", ".join(links) if links else ""
-
-        res = chain_email.invoke({
+        return chain_email, {
             "job_description": str(job),
             "skills_list": skills_str,
             "link_list": link_list,
             "link1": link1,
             "link2": link2
-        })
+        }
+
+    # Post-process a finished email: keyword extraction, link-inclusion count and the email_logs.json write
+    def _log_mail(self, job, links, content, time_to_first_token=None, total_time=None):
         # Extract Job Description keywords
         job_desc = str(job)
         job_keywords = re.findall(r'\b[A-Z][a-z]{3,}\b', job_desc) 
 
         # Count included links
-        included_links_count = sum(1 for link in links if link in res.content)
+        included_links_count = sum(1 for link in links if link in content)
         total_links = len(links)
 
         
@@ -116,16 +145,53 @@ class Chain:
             'timestamp': datetime.now().isoformat(),
             'job_title': job.get('title', 'Unknown'),
             'job_desc_keywords': job_keywords,
-            'generated_email': res.content,
+            'generated_email': content,
             'included_links_count': included_links_count,
-            'total_links': total_links
+            'total_links': total_links,
+            'time_to_first_token': time_to_first_token,
+            'total_time': total_time
         }
 
         # Store logs
-        with open('app/email_logs.json', 'a', encoding='utf-8') as f:
-            json.dump(log_entry, f, ensure_ascii=False)
-            f.write('\n')
+        with _email_log_lock:
+            with open('app/email_logs.json', 'a', encoding='utf-8') as f:
+                json.dump(log_entry, f, ensure_ascii=False)
+                f.write('\n')
+
+    @timed('generate_mail')
+    def generate_mail(self, job, links, skills=None):
+        chain_email, inputs = self._mail_inputs(job, links, skills)
+        start = time.perf_counter()
+        res = chain_email.invoke(inputs)
+        total_time = time.perf_counter() - start
+        record_tokens('generate_mail', res)
+        # Non-streaming calls have no first-token time; only the total is logged
+        self._log_mail(job, links, res.content, total_time=total_time)
         return res.content
 
+    # Yield email chunks as the model produces them; logging runs in a background thread once the stream ends
+    @timed('stream_mail')
+    def stream_mail(self, job, links, skills=None):
+        chain_email, inputs = self._mail_inputs(job, links, skills)
+        start = time.perf_counter()
+        time_to_first_token = None
+        parts = []
+        for chunk in chain_email.stream(inputs):
+            # Providers report token usage on the final, usually empty, chunk
+            record_tokens('stream_mail', chunk)
+            if not chunk.content:
+                continue
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - start
+                observe('llm_first_token_seconds', time_to_first_token, stage='stream_mail')
+            parts.append(chunk.content)
+            yield chunk.content
+        total_time = time.perf_counter() - start
+        threading.Thread(
+            target=self._log_mail,
+            args=(job, links, "".join(parts), time_to_first_token, total_time),
+            daemon=True
+        ).start()
+
 if __name__ == "__main__":
     print(os.getenv("GROQ_API_KEY"))
\ No newline at end of file
@@ -0,0 +1,136 @@
+import hashlib
+import zlib
+from itertools import combinations
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+from utils import sanitize_text
+from job_store import connect, save_clusters, decompress_description, JOBS_DB
+
+NUM_PERM = 128
+# 16 bands x 8 rows puts the LSH candidate threshold near Jaccard 0.7; candidates are then verified against SIMILARITY_THRESHOLD
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+SHINGLE_SIZE = 5
+SIMILARITY_THRESHOLD = 0.8
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed so signatures stored in earlier runs stay comparable
+_rng = np.random.RandomState(1)
+PERM_A = _rng.randint(1, MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.randint(0, MAX_HASH, size=NUM_PERM, dtype=np.uint64)
+
+# Signatures and LSH buckets persist next to the jobs so unchanged postings are never re-hashed
+DEDUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS minhash_signatures (
+    job_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    signature BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lsh_buckets (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    job_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets(band, bucket);
+CREATE INDEX IF NOT EXISTS idx_lsh_job ON lsh_buckets(job_id);
+"""
+
+# Word shingles of the normalized description, hashed to 32-bit ints
+def shingle_hashes(text):
+    words = sanitize_text(text).lower().split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {' '.join(words)} if words else set()
+    else:
+        shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+def minhash_signature(text):
+    hashes = shingle_hashes(text)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, MAX_HASH, dtype=np.uint64)
+    # (a*x + b) mod p, truncated to 32 bits; uint64 wraparound is acceptable for hashing
+    permuted = (np.outer(PERM_A, hashes) + PERM_B[:, None]) % MERSENNE_PRIME & MAX_HASH
+    return permuted.min(axis=1)
+
+def band_buckets(signature):
+    return [hashlib.sha1(signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()).hexdigest()[:16]
+            for band in range(NUM_BANDS)]
+
+def estimated_similarity(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+def _find(parent, job_id):
+    while parent[job_id] != job_id:
+        parent[job_id] = parent[parent[job_id]]
+        job_id = parent[job_id]
+    return job_id
+
+# Cluster reposted requisitions within and across companies; each cluster keeps its first-scraped job as representative
+def dedupe_jobs(db_path=JOBS_DB):
+    with closing(connect(db_path)) as conn, conn:
+        conn.executescript(DEDUP_SCHEMA)
+        jobs = conn.execute(
+            "SELECT j.job_id, j.company, j.title, d.description FROM jobs j "
+            "LEFT JOIN descriptions d ON d.job_id = j.job_id ORDER BY j.rowid"
+        ).fetchall()
+        current_ids = [row['job_id'] for row in jobs]
+
+        # Drop index entries for postings that are no longer cached
+        conn.execute("CREATE TEMP TABLE current_jobs (job_id TEXT PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO current_jobs VALUES (?)", [(job_id,) for job_id in current_ids])
+        conn.execute("DELETE FROM minhash_signatures WHERE job_id NOT IN (SELECT job_id FROM current_jobs)")
+        conn.execute("DELETE FROM lsh_buckets WHERE job_id NOT IN (SELECT job_id FROM current_jobs)")
+        conn.execute("DROP TABLE current_jobs")
+
+        stored = {row['job_id']: (row['content_hash'], row['signature'])
+                  for row in conn.execute("SELECT job_id, content_hash, signature FROM minhash_signatures")}
+        signatures = {}
+        rehashed = 0
+        for row in jobs:
+            description = decompress_description(row['description'])
+            content_hash = hashlib.sha1(description.encode('utf-8')).hexdigest()
+            previous = stored.get(row['job_id'])
+            if previous and previous[0] == content_hash:
+                signatures[row['job_id']] = np.frombuffer(previous[1], dtype=np.uint64)
+                continue
+            signature = minhash_signature(description)
+            signatures[row['job_id']] = signature
+            rehashed += 1
+            conn.execute("INSERT OR REPLACE INTO minhash_signatures (job_id, content_hash, signature) VALUES (?, ?, ?)",
+                         (row['job_id'], content_hash, signature.tobytes()))
+            conn.execute("DELETE FROM lsh_buckets WHERE job_id = ?", (row['job_id'],))
+            conn.executemany("INSERT INTO lsh_buckets (band, bucket, job_id) VALUES (?, ?, ?)",
+                             [(band, bucket, row['job_id']) for band, bucket in enumerate(band_buckets(signature))])
+
+        # Candidate pairs share at least one band bucket; confirm them on the title and the full signature.
+        # Templated postings (e.g. store roles) share most of their text, so differing titles are never merged.
+        titles = {row['job_id']: sanitize_text(row['title']).lower() for row in jobs}
+        parent = {job_id: job_id for job_id in current_ids}
+        order = {job_id: index for index, job_id in enumerate(current_ids)}
+        buckets = conn.execute(
+            "SELECT GROUP_CONCAT(job_id, '\n') AS members FROM lsh_buckets GROUP BY band, bucket HAVING COUNT(*) > 1"
+        ).fetchall()
+        for bucket in buckets:
+            members = sorted(set(bucket['members'].split('\n')), key=order.get)
+            for first, other in combinations(members, 2):
+                if _find(parent, first) == _find(parent, other):
+                    continue
+                if titles[first] == titles[other] and estimated_similarity(signatures[first], signatures[other]) >= SIMILARITY_THRESHOLD:
+                    root_a, root_b = _find(parent, first), _find(parent, other)
+                    # The earlier-scraped root stays representative
+                    if order[root_b] < order[root_a]:
+                        root_a, root_b = root_b, root_a
+                    parent[root_b] = root_a
+
+    clusters = {job_id: _find(parent, job_id) for job_id in current_ids}
+    save_clusters(clusters, db_path=db_path)
+
+    companies = {row['job_id']: row['company'] for row in jobs}
+    duplicates = [job_id for job_id, rep in clusters.items() if rep != job_id]
+    cross_company = [job_id for job_id in duplicates if companies[job_id] != companies[clusters[job_id]]]
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Near-duplicate detection: {len(current_ids)} jobs, {len(current_ids) - len(duplicates)} clusters, "
+                f"{len(duplicates)} reposts ({len(cross_company)} across companies), {rehashed} signatures recomputed\n")
+    return clusters
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+import aiohttp
+from bs4 import BeautifulSoup
+from utils import sanitize_text
+from metrics import record_cache, record_error
+
+CACHE_DIR = 'app/data/http_cache'
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120"
+
+# Convert an HTML page to plain text like WebBaseLoader does, minus scripts and styles
+def html_to_text(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    return soup.get_text(separator=' ')
+
+# Fetch job pages concurrently over one pooled session with an on-disk ETag/Last-Modified cache
+class PageFetcher:
+    def __init__(self, cache_dir=CACHE_DIR, limit=20, limit_per_host=4, timeout=30, user_agent=None):
+        self.cache_dir = cache_dir
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self.user_agent = user_agent or os.getenv("USER_AGENT", DEFAULT_USER_AGENT)
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_cached(self, url):
+        path = self._cache_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry if entry.get('url') == url else None
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def _store(self, url, etag, last_modified, text):
+        # Pages without validators cannot be revalidated, so there is nothing worth caching
+        if not etag and not last_modified:
+            return
+        entry = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': datetime.now().isoformat(),
+            'text': text
+        }
+        tmp_path = self._cache_path(url) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, self._cache_path(url))
+
+    # Fetch one URL, sending conditional headers when a cached copy exists; returns (url, sanitized_text, error)
+    async def _fetch_one(self, session, url):
+        cached = self._load_cached(url)
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        try:
+            async with session.get(url, headers=headers) as response:
+                if response.status == 304 and cached:
+                    self.stats['hits'] += 1
+                    record_cache('http', True)
+                    return url, sanitize_text(cached['text']), None
+                response.raise_for_status()
+                html = await response.text(errors='replace')
+                text = html_to_text(html)
+                self._store(url, response.headers.get('ETag'), response.headers.get('Last-Modified'), text)
+                self.stats['misses'] += 1
+                record_cache('http', False)
+                return url, sanitize_text(text), None
+        except Exception as e:
+            self.stats['errors'] += 1
+            record_error('fetch_page', e)
+            with open('app/filter_log.txt', 'a') as f:
+                f.write(f"{datetime.now().isoformat()} - Error fetching {url}: {e}\n")
+            return url, "", str(e)
+
+    # Yield (url, sanitized_text, error) tuples in completion order
+    async def iter_pages(self, urls):
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={'User-Agent': self.user_agent}) as session:
+            tasks = [asyncio.ensure_future(self._fetch_one(session, url)) for url in dict.fromkeys(urls)]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    # Synchronous generator for Streamlit: runs the event loop in a helper thread and hands pages over as they finish
+    def iter_pages_sync(self, urls):
+        results = queue.Queue()
+        done = object()
+
+        async def produce():
+            async for page in self.iter_pages(urls):
+                results.put(page)
+
+        def run():
+            try:
+                asyncio.run(produce())
+            finally:
+                results.put(done)
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        while True:
+            page = results.get()
+            if page is done:
+                break
+            yield page
+        worker.join()
+
+    def fetch_all(self, urls):
+        return list(self.iter_pages_sync(urls))
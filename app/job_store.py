@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import zlib
+from contextlib import closing
+from datetime import datetime
+
+JOBS_DB = 'app/data/jobs_cache.db'
+JOBS_JSON = 'app/data/jobs_cache.json'
+
+# Bumped when the table layout changes; older stores are rebuilt in place by connect()
+SCHEMA_VERSION = 2
+# Fields the app reads get their own columns; the remaining non-empty JobSpy fields are kept in `extra`
+JOB_COLUMNS = ('title', 'job_url', 'location', 'date_posted', 'skills', 'scraped_at')
+
+# Metadata and descriptions live in separate tables so listing jobs never reads description pages;
+# descriptions are zlib-compressed, which is what keeps the store smaller than the JSON cache
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    company TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    job_url TEXT,
+    location TEXT,
+    date_posted TEXT,
+    skills TEXT,
+    scraped_at TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_company ON jobs(company, position);
+CREATE TABLE IF NOT EXISTS descriptions (
+    job_id TEXT PRIMARY KEY,
+    description BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_clusters (
+    job_id TEXT PRIMARY KEY,
+    representative_id TEXT NOT NULL
+);
+"""
+# Jobs that are not near-duplicates of another cached posting (see dedup.py)
+REPRESENTATIVE_FILTER = ("NOT EXISTS (SELECT 1 FROM job_clusters c "
+                         "WHERE c.job_id = j.job_id AND c.representative_id != j.job_id)")
+
+# Open the store, creating the schema on first use; descriptions are read through SQLite's memory map
+def connect(db_path=JOBS_DB):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+        _upgrade(conn)
+    conn.executescript(SCHEMA)
+    return conn
+
+# Rebuild a store written with the first layout (all metadata in one JSON `meta` column, plain-text descriptions)
+def _upgrade(conn):
+    columns = [row['name'] for row in conn.execute("PRAGMA table_info(jobs)")]
+    with conn:
+        if 'meta' in columns:
+            rows = conn.execute(
+                "SELECT j.job_id, j.company, j.position, j.meta, d.description FROM jobs j "
+                "LEFT JOIN descriptions d ON d.job_id = j.job_id ORDER BY j.rowid"
+            ).fetchall()
+            conn.execute("DROP TABLE jobs")
+            conn.execute("DROP TABLE descriptions")
+            # Statement by statement: executescript would commit the drops before the rows are copied back
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            for row in rows:
+                job = json.loads(row['meta'])
+                job['description'] = row['description'] or ''
+                _insert_job(conn, row['job_id'], row['company'], row['position'], job)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    if 'meta' in columns:
+        # Give the space of the old plain-text descriptions back
+        conn.execute("VACUUM")
+
+def _is_empty(value):
+    # JobSpy leaves missing fields as '', None or NaN
+    return value is None or value == '' or (isinstance(value, float) and value != value)
+
+def compress_description(description):
+    return zlib.compress(str(description or '').encode('utf-8'), 6)
+
+def decompress_description(blob):
+    return zlib.decompress(blob).decode('utf-8') if blob else ''
+
+def _insert_job(conn, job_id, company, position, job):
+    columns = {key: None if _is_empty(job.get(key)) else str(job.get(key)) for key in JOB_COLUMNS}
+    columns['title'] = columns['title'] or ''
+    extra = {key: value for key, value in job.items()
+             if key not in JOB_COLUMNS and key not in ('description', 'job_id') and not _is_empty(value)}
+    conn.execute(
+        f"INSERT OR REPLACE INTO jobs (job_id, company, position, {', '.join(JOB_COLUMNS)}, extra) "
+        f"VALUES (?, ?, ?, {', '.join('?' for _ in JOB_COLUMNS)}, ?)",
+        (job_id, company, position, *columns.values(), json.dumps(extra, default=str, separators=(',', ':')))
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO descriptions (job_id, description) VALUES (?, ?)",
+        (job_id, compress_description(job.get('description')))
+    )
+
+# Job dict from a jobs row (plus an optional compressed description), without the empty fields
+def _job_from_row(row, description=None):
+    job = json.loads(row['extra'] or '{}')
+    job.update({key: row[key] for key in JOB_COLUMNS if row[key] is not None})
+    job['description'] = decompress_description(description)
+    job['job_id'] = row['job_id']
+    return job
+
+# Stable job ID: company plus the JobSpy id, or a hash of title and URL when the id is missing
+def job_key(company, job):
+    source_id = job.get('id')
+    if not isinstance(source_id, str) or not source_id:
+        source_id = hashlib.sha1(f"{job.get('title', '')}|{job.get('job_url', '')}".encode('utf-8')).hexdigest()[:16]
+    return f"{company}:{source_id}"
+
+# Write scraped jobs ({company: [job, ...]}), replacing each listed company's previous postings
+def save_jobs(all_jobs, db_path=JOBS_DB, clear=False):
+    with closing(connect(db_path)) as conn, conn:
+        if clear:
+            conn.execute("DELETE FROM jobs")
+            conn.execute("DELETE FROM descriptions")
+            conn.execute("DELETE FROM job_clusters")
+        for company, jobs in all_jobs.items():
+            # Clusters touching this company are stale until dedup runs again
+            conn.execute(
+                "DELETE FROM job_clusters WHERE job_id IN (SELECT job_id FROM jobs WHERE company = ?) "
+                "OR representative_id IN (SELECT job_id FROM jobs WHERE company = ?)",
+                (company, company)
+            )
+            conn.execute("DELETE FROM descriptions WHERE job_id IN (SELECT job_id FROM jobs WHERE company = ?)", (company,))
+            conn.execute("DELETE FROM jobs WHERE company = ?", (company,))
+            for position, job in enumerate(jobs or []):
+                _insert_job(conn, job_key(company, job), company, position, job)
+
+# Companies with cached jobs, in scrape order
+def load_companies(db_path=JOBS_DB):
+    with closing(connect(db_path)) as conn:
+        rows = conn.execute("SELECT company FROM jobs GROUP BY company ORDER BY MIN(rowid)").fetchall()
+    return [row['company'] for row in rows]
+
+# (job_id, title) pairs for one company, without touching descriptions
+def load_job_titles(company, db_path=JOBS_DB, representatives_only=False):
+    where = f" AND {REPRESENTATIVE_FILTER}" if representatives_only else ""
+    with closing(connect(db_path)) as conn:
+        rows = conn.execute(f"SELECT j.job_id, j.title FROM jobs j WHERE j.company = ?{where} ORDER BY j.position", (company,)).fetchall()
+    return [(row['job_id'], row['title']) for row in rows]
+
+# Full job record, loading the description only for this one job
+def load_job(job_id, db_path=JOBS_DB):
+    with closing(connect(db_path)) as conn:
+        row = conn.execute(
+            "SELECT j.*, d.description FROM jobs j LEFT JOIN descriptions d ON d.job_id = j.job_id WHERE j.job_id = ?",
+            (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return _job_from_row(row, row['description'])
+
+# Every job with its description, in the same {company: [job, ...]} shape as the old JSON cache
+def load_all_jobs(db_path=JOBS_DB, representatives_only=False):
+    all_jobs = {}
+    where = f" WHERE {REPRESENTATIVE_FILTER}" if representatives_only else ""
+    with closing(connect(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT j.*, d.description FROM jobs j "
+            f"LEFT JOIN descriptions d ON d.job_id = j.job_id{where} ORDER BY j.rowid"
+        )
+        for row in rows:
+            all_jobs.setdefault(row['company'], []).append(_job_from_row(row, row['description']))
+    return all_jobs
+
+# Store extracted skills as the comma-separated string preprocess_and_embed expects
+def save_job_skills(skills_by_job, db_path=JOBS_DB):
+    with closing(connect(db_path)) as conn, conn:
+        conn.executemany("UPDATE jobs SET skills = ? WHERE job_id = ?",
+                         [(", ".join(skills) or None, job_id) for job_id, skills in skills_by_job.items()])
+
+# Replace near-duplicate clusters ({job_id: representative_id})
+def save_clusters(clusters, db_path=JOBS_DB):
+    with closing(connect(db_path)) as conn, conn:
+        conn.execute("DELETE FROM job_clusters")
+        conn.executemany("INSERT INTO job_clusters (job_id, representative_id) VALUES (?, ?)", list(clusters.items()))
+
+# One-shot migration from the pretty-printed JSON cache
+def migrate_json(json_path=JOBS_JSON, db_path=JOBS_DB):
+    with open(json_path, 'r') as f:
+        all_jobs = json.load(f)
+    save_jobs(all_jobs, db_path=db_path, clear=True)
+    total = sum(len(jobs) for jobs in all_jobs.values())
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Migrated {total} jobs for {len(all_jobs)} companies from {json_path} to {db_path}\n")
+    return total
+
+if __name__ == "__main__":
+    json_path = sys.argv[1] if len(sys.argv) > 1 else JOBS_JSON
+    db_path = sys.argv[2] if len(sys.argv) > 2 else JOBS_DB
+    if os.path.exists(db_path):
+        print(f"{db_path} already exists; it will be overwritten with the contents of {json_path}.")
+    print(f"Migrated {migrate_json(json_path, db_path)} jobs to {db_path}")
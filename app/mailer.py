@@ -0,0 +1,33 @@
+import smtplib
+import re
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from metrics import timed, record_error
+
+# Read the Gmail app password from Streamlit secrets only when no password is passed in
+def _gmail_password():
+    import streamlit as st
+    return st.secrets["GMAIL_PASSWORD"]
+
+# Send email to recruiter
+@timed('send_email')
+def send_email(to_email, subject, body, from_email="dummysender@gmail.com", smtp_host='smtp.gmail.com', smtp_port=587, use_tls=True, password=None):
+    cleaned_body = re.sub(r'^Subject:.*$\n?', '', body, flags=re.MULTILINE | re.IGNORECASE).strip()
+    try:
+        msg = MIMEMultipart()
+        msg['From'] = from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(cleaned_body, 'plain'))
+        server = smtplib.SMTP(smtp_host, smtp_port)
+        # Local relays (e.g. the benchmark SMTP sink) accept plain, unauthenticated mail
+        if use_tls:
+            server.starttls()
+            server.login(from_email, password if password is not None else _gmail_password())
+        text = msg.as_string()
+        server.sendmail(from_email, to_email, text)
+        server.quit()
+        return "Email sent successfully!"
+    except Exception as e:
+        record_error('send_email', e)
+        return f"Failed to send email: {str(e)}"
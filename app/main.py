@@ -1,69 +1,43 @@
 import streamlit as st
-from langchain_community.document_loaders import WebBaseLoader
 from chains import Chain
-from scraper import batch_scrape
-from preprocess import preprocess_and_embed
-from portfolio import Portfolio
+from tasks import submit as submit_task, list_tasks, latest_task, cancel_task, ACTIVE_STATUSES
+from portfolio import Portfolio, format_portfolio_links
+from fetcher import PageFetcher
+from job_store import JOBS_DB, JOBS_JSON, migrate_json, load_companies, load_job_titles, load_job
+from dedup import dedupe_jobs
+from skills import SkillExtractor, resolve_skills
+from matches import lookup_links, jobs_for_link, matches_stale, portfolio_rows, portfolio_fingerprint
 import json
 import os
 from datetime import datetime
 import pandas as pd
-from utils import sanitize_text
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import re
-from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
-
-# Format portfolio links from ChromaDB query to match prompt structure
-def format_portfolio_links(portfolio_links):
-    if not portfolio_links:
-        with open('app/filter_log.txt', 'a') as f:
-            f.write(f"{datetime.now().isoformat()} - Warning: No portfolio links returned from query\n")
-        return []
-    flattened_links = []
-    for meta_list in portfolio_links:
-        for meta in meta_list:
-            if isinstance(meta, dict) and 'links' in meta and isinstance(meta['links'], str):
-                flattened_links.append(meta['links'])
-    if not flattened_links:
-        with open('app/filter_log.txt', 'a') as f:
-            f.write(f"{datetime.now().isoformat()} - Warning: No valid portfolio links in query result\n")
-        return []
-    # Top 2 most relevant
-    selected_links = flattened_links[:2]
-    if len(selected_links) < 2:
-        with open('app/filter_log.txt', 'a') as f:
-            f.write(f"{datetime.now().isoformat()} - Only {len(selected_links)} portfolio links available (wanted 2); check query relevance\n")
-    return selected_links
-
-# Send email to recruiter
-def send_email(to_email, subject, body, from_email="dummysender@gmail.com"):
-    cleaned_body = re.sub(r'^Subject:.*$\n?', '', body, flags=re.MULTILINE | re.IGNORECASE).strip()
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = from_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(cleaned_body, 'plain'))
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(from_email, st.secrets["GMAIL_PASSWORD"])
-        text = msg.as_string()
-        server.sendmail(from_email, to_email, text)
-        server.quit()
-        return "Email sent successfully!"
-    except Exception as e:
-        return f"Failed to send email: {str(e)}"
+from mailer import send_email
+from metrics import start_exporters
 
 st.title("Cold Email Generator for Tech Jobs")
 st.set_page_config(layout="wide", page_title="Cold Email Generator", page_icon="📧")
 
+# Prometheus endpoint and snapshot file when COLD_EMAIL_METRICS=1 (started once per process)
+start_exporters('app', serve_http=True)
+
 # Initialize Portfolio
 portfolio = Portfolio(file_path="app/resource/portfolio.csv")
 portfolio.load_portfolio()
 
+# Shared page fetcher with on-disk HTTP cache for manual job URLs
+@st.cache_resource
+def get_page_fetcher():
+    return PageFetcher(cache_dir='app/data/http_cache')
+
+page_fetcher = get_page_fetcher()
+
+# Skills dictionary compiled once from the scraper keywords and portfolio.csv
+@st.cache_resource
+def get_skill_extractor():
+    return SkillExtractor(portfolio_csv='app/resource/portfolio.csv')
+
+skill_extractor = get_skill_extractor()
+
 # Load companies.json for recruiting emails
 companies_file = 'app/data/companies.json'
 with open(companies_file, 'r') as f:
@@ -71,162 +45,226 @@ with open(companies_file, 'r') as f:
 company_emails = {comp['name']: comp.get('recruiting_email', 'dummyrecruiting@gmail.com') for comp in companies_data['companies']}
 
 # Initialize session state
-if 'job_data' not in st.session_state:
-    st.session_state.job_data = None
-if 'formatted_links' not in st.session_state:
-    st.session_state.formatted_links = None
-if 'manual_email_body' not in st.session_state:
-    st.session_state.manual_email_body = None
+if 'manual_results' not in st.session_state:
+    st.session_state.manual_results = []
 if 'batch_email_body' not in st.session_state:
     st.session_state.batch_email_body = None
+# Resolved skills per job_id, so reruns (button clicks, selectbox changes) never repeat the LLM fallback
+if 'job_skills' not in st.session_state:
+    st.session_state.job_skills = {}
 
 # Fortune 500 scraping section
 st.subheader("Extract Fortune 500 Companies")
+# Scraping and indexing run in the background worker pool (python app/tasks.py), not in this script run
 if st.button("🔄 Extract Jobs for Fortune 500 Companies"):
-    with st.spinner("Extracting jobs..."):
-        jobs = batch_scrape(companies_file='app/data/companies.json', batch_size=10)
-        if jobs:
-            preprocess_and_embed(jobs_file='app/data/jobs_cache.json')
-            st.success("Jobs extracted and cached successfully!")
-        else:
-            st.error("No jobs found. Check app/filter_log.txt and app/raw_jobs_log.txt.")
+    task_id = submit_task('scrape', {'companies_file': 'app/data/companies.json', 'batch_size': 10, 'follow_up': ['enrich', 'index']})
+    st.success(f"Scrape task #{task_id} queued. Enrichment, then indexing, are queued automatically as each step finishes.")
+
+# Background task status, polled without rerunning the whole page
+@st.fragment(run_every=5)
+def show_background_tasks():
+    recent_tasks = list_tasks(limit=10)
+    if not recent_tasks:
+        return
+    with st.expander("Background tasks", expanded=any(task['status'] in ACTIVE_STATUSES for task in recent_tasks)):
+        for task in recent_tasks:
+            cols = st.columns([4, 1])
+            with cols[0]:
+                st.progress(task['progress'], text=f"#{task['id']} {task['kind']} – {task['status']}: {task['message']}")
+                if task['status'] == 'failed' and task['error']:
+                    st.caption(task['error'].splitlines()[0])
+            with cols[1]:
+                if task['status'] in ACTIVE_STATUSES and st.button("Cancel", key=f"cancel_task_{task['id']}"):
+                    cancel_task(task['id'])
+        if any(task['status'] == 'queued' for task in recent_tasks):
+            st.caption("Queued tasks need a running worker pool: python app/tasks.py")
+
+show_background_tasks()
+
+# Known recruiting addresses for manually extracted jobs
+RECRUITING_EMAILS = {
+    'Apple': 'applecareers@apple.com',
+    'Walmart': 'talentacquisition@walmart.com',
+    'Amazon': 'hiring@amazon.com',
+    'UnitedHealth Group': 'Investor_Relations@uhc.com',
+    'Unknown': 'recruiting@example.com'
+}
+
+# Extract one job from fetched page text, match portfolio links and generate its email
+def process_job_page(chain, job_url, data):
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Scraping {job_url} completed, raw data length: {len(data)}, sample: {data[:200]}\n")
+    jobs = chain.extract_jobs(data)
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Extracted jobs: {jobs}\n")
+    if not (jobs and isinstance(jobs, list) and len(jobs) > 0):
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - No job data extracted from {job_url}\n")
+        return None
+    job_data = jobs[0]
+    if not job_data.get('title') and job_data.get('role'):
+        job_data['title'] = job_data['role']
+    elif not job_data.get('title'):
+        job_data['title'] = f"Job from {job_url}"
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Job data extracted: {job_data}\n")
+    skills = job_data.get('skills', [])
+    # Extract skills from description if empty, locally first
+    if not skills:
+        skills, _, _ = resolve_skills(skill_extractor, chain, job_data.get('description', '') or data)
+        if not skills:
+            # Default skills if no skills found
+            skills = ["software development", "data engineering"]
+
+    portfolio_links = portfolio.query_links(skills, job_data.get('description', ''))
+    formatted_links = format_portfolio_links(portfolio_links)
+    # Log retrieved links
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Retrieved portfolio links for skills {skills}: {formatted_links}\n")
+    # Generate email, rendering tokens as they arrive
+    st.markdown(f"**{job_data['title']}**")
+    email_body = st.write_stream(chain.stream_mail(job=job_data, links=formatted_links, skills=skills))
+    return {'job_url': job_url, 'job_data': job_data, 'formatted_links': formatted_links, 'email_body': email_body}
 
 # Manual Job URL Input and Email Generation
-st.subheader("Enter a Job URL")
+st.subheader("Enter Job URLs")
 with st.form(key="manual_job_form"):
-    job_url = st.text_input("Paste a job URL from any job site (e.g., https://jobs.apple.com/...)")
+    job_urls_input = st.text_area("Paste one or more job URLs from any job site, one per line (e.g., https://jobs.apple.com/...)")
     scrape_button = st.form_submit_button("🔄 Extract Job Details & Generate Email")
-    if scrape_button and job_url:
-        with st.spinner("Extracting job..."):
-            try:
-                chain = Chain()
-                loader = WebBaseLoader([job_url])
-                data = sanitize_text(loader.load().pop().page_content)
-                with open('app/filter_log.txt', 'a') as f:
-                    f.write(f"{datetime.now().isoformat()} - Scraping {job_url} completed, raw data length: {len(data)}, sample: {data[:200]}\n")
-                jobs = chain.extract_jobs(data)
-                with open('app/filter_log.txt', 'a') as f:
-                    f.write(f"{datetime.now().isoformat()} - Extracted jobs: {jobs}\n")
-                if jobs and isinstance(jobs, list) and len(jobs) > 0:
-                    job_data = jobs[0]
-                    if not job_data.get('title') and job_data.get('role'):
-                        job_data['title'] = job_data['role']
-                    elif not job_data.get('title'):
-                        job_data['title'] = f"Job from {job_url}"
-                    with open('app/filter_log.txt', 'a') as f:
-                        f.write(f"{datetime.now().isoformat()} - Job data extracted: {job_data}\n")
-                    skills = job_data.get('skills', [])
-                    # Extract skills from description if empty
-                    if not skills:
-                        prompt_skills_fallback = PromptTemplate.from_template(
-                            """
-                            Extract a list of 5-10 technical skills and qualifications from this job description: {desc}
-                            Return ONLY a JSON array like ["skill1", "skill2"]. No preamble.
-                            """
-                        )
-                        chain_fallback = prompt_skills_fallback | chain.llm
-                        fallback_res = chain_fallback.invoke({"desc": job_data.get('description', '')})
-                        try:
-                            json_parser = JsonOutputParser()
-                            skills = json_parser.parse(fallback_res.content)
-                        except:
-                            skills = []  
-                        if not skills:
-                            # Default skills if no skills found
-                            skills = ["software development", "data engineering"]
-                    if not skills:
-                        st.warning("No skills extracted from job description. Using default skills for portfolio query.")
-                        skills = ["software development", "data engineering"]
-                    
-                    portfolio_links = portfolio.query_links(skills, job_data.get('description', ''))
-                    formatted_links = format_portfolio_links(portfolio_links)
-                    # Log retrieved links
-                    with open('app/filter_log.txt', 'a') as f:
-                        f.write(f"{datetime.now().isoformat()} - Retrieved portfolio links for skills {skills}: {formatted_links}\n")
-                    st.session_state.job_data = job_data
-                    st.session_state.formatted_links = formatted_links
-                    # Generate email
-                    st.session_state.manual_email_body = chain.generate_mail(job=job_data, links=formatted_links, skills=skills)
-                else:
-                    st.error("No job data extracted from the URL.")
+    job_urls = [url.strip() for url in job_urls_input.splitlines() if url.strip()]
+    if scrape_button and job_urls:
+        with st.spinner(f"Extracting {len(job_urls)} job(s)..."):
+            chain = Chain()
+            results = []
+            # Pages arrive as soon as each download finishes, so extraction overlaps the remaining fetches
+            for job_url, data, error in page_fetcher.iter_pages_sync(job_urls):
+                if error:
+                    st.error(f"Failed to fetch {job_url}: {error}")
+                    continue
+                try:
+                    result = process_job_page(chain, job_url, data)
+                    if result:
+                        results.append(result)
+                    else:
+                        st.error(f"No job data extracted from {job_url}.")
+                except Exception as e:
+                    st.error(f"An Error Occurred for {job_url}: {e}")
                     with open('app/filter_log.txt', 'a') as f:
-                        f.write(f"{datetime.now().isoformat()} - No job data extracted from {job_url}\n")
-            except Exception as e:
-                st.error(f"An Error Occurred: {e}")
-                with open('app/filter_log.txt', 'a') as f:
-                    f.write(f"{datetime.now().isoformat()} - Exception during scraping {job_url}: {str(e)}\n")
+                        f.write(f"{datetime.now().isoformat()} - Exception during scraping {job_url}: {str(e)}\n")
+            st.session_state.manual_results = results
 
 # Dropdown for recruiting emails
-if st.session_state.job_data and st.session_state.manual_email_body:
+if st.session_state.manual_results:
     st.subheader("Send Email (Job Posting URL)")
-    st.text_area("Email Preview:", value=st.session_state.manual_email_body, height=300, disabled=True)
-    company_name = st.session_state.job_data.get('company_name', 'Unknown')
-    recruiting_emails = {
-        'Apple': 'applecareers@apple.com',
-        'Walmart': 'talentacquisition@walmart.com',
-        'Amazon': 'hiring@amazon.com',
-        'UnitedHealth Group': 'Investor_Relations@uhc.com',
-        'Unknown': 'recruiting@example.com'
-    }
-    recruiting = recruiting_emails.get(company_name, 'recruiting@example.com')
+    manual_results = st.session_state.manual_results
+    selected_index = st.selectbox(
+        "Select extracted job",
+        range(len(manual_results)),
+        format_func=lambda i: f"{manual_results[i]['job_data']['title']} ({manual_results[i]['job_url']})",
+        key="manual_result_select"
+    )
+    manual_result = manual_results[selected_index]
+    st.text_area("Email Preview:", value=manual_result['email_body'], height=300, disabled=True)
+    company_name = manual_result['job_data'].get('company_name', 'Unknown')
+    recruiting = RECRUITING_EMAILS.get(company_name, 'recruiting@example.com')
     email_options = [recruiting, 'dummyrecruiting@gmail.com']
     selected_email = st.selectbox("Select recipient email", email_options, key="manual_email_select")
     
     if st.button("📧 Send Email", key="manual_send_button"):
         with st.spinner("Sending email..."):
-            subject = f"Unlock Your Business Potential with GunnenAI - {st.session_state.job_data['title']}"
-            result = send_email(selected_email, subject, st.session_state.manual_email_body)
+            subject = f"Unlock Your Business Potential with GunnenAI - {manual_result['job_data']['title']}"
+            result = send_email(selected_email, subject, manual_result['email_body'])
             st.success(result)
+
+    if len(manual_results) > 1:
+        # Extracted jobs carry no company, so recipients are chosen per email before a bulk send
+        st.write("**Bulk send recipients**")
+        bulk_recipients = st.data_editor(
+            pd.DataFrame({
+                'Send': [True] * len(manual_results),
+                'Job': [f"{entry['job_data']['title']} ({entry['job_url']})" for entry in manual_results],
+                'Recipient': ['dummyrecruiting@gmail.com'] * len(manual_results)
+            }),
+            disabled=['Job'],
+            hide_index=True,
+            key="manual_bulk_recipients"
+        )
+        selected_rows = [(entry, row) for entry, (_, row) in zip(manual_results, bulk_recipients.iterrows()) if row['Send']]
+        if st.button(f"📨 Send {len(selected_rows)} emails in background", key="manual_bulk_send_button", disabled=not selected_rows):
+            invalid = [row['Job'] for _, row in selected_rows if '@' not in str(row['Recipient'] or '')]
+            if invalid:
+                st.error(f"Enter a recipient email for: {', '.join(invalid)}")
+            else:
+                emails = [{
+                    'to': str(row['Recipient']).strip(),
+                    'subject': f"Unlock Your Business Potential with GunnenAI - {entry['job_data']['title']}",
+                    'body': entry['email_body']
+                } for entry, row in selected_rows]
+                task_id = submit_task('send', {'emails': emails})
+                st.success(f"Bulk send task #{task_id} queued.")
 else:
     st.write("Extract a job first to enable email sending.")
 
 # Batch Job Selection and Email Generation
 st.subheader("Generate Cold Email")
-jobs_cache_file = 'app/data/jobs_cache.json'
-if os.path.exists(jobs_cache_file):
-    with open(jobs_cache_file, 'r') as f:
-        jobs_cache = json.load(f)
-    companies = list(jobs_cache.keys())
+# One-shot migration of a legacy JSON cache into the job store
+if not os.path.exists(JOBS_DB) and os.path.exists(JOBS_JSON):
+    with st.spinner("Migrating jobs_cache.json to the job store..."):
+        migrate_json(JOBS_JSON, JOBS_DB)
+        dedupe_jobs(JOBS_DB)
+if os.path.exists(JOBS_DB):
+    # Rescore jobs against the portfolio in the background when portfolio.csv or the job cache changed.
+    # Not while a scrape/index chain is running (it ends with a match refresh), and not again after a match task
+    # for this same portfolio.csv failed, which would otherwise be resubmitted on every rerun
+    if matches_stale(portfolio.file_path, JOBS_DB):
+        current_portfolio = portfolio_fingerprint(portfolio.file_path)
+        last_match = latest_task('match')
+        pipeline_active = any(task['kind'] in ('scrape', 'enrich', 'index', 'match') and task['status'] in ACTIVE_STATUSES
+                              for task in list_tasks(limit=20))
+        failed_for_portfolio = (last_match is not None and last_match['status'] == 'failed'
+                                and last_match['payload'].get('portfolio_fingerprint') == current_portfolio)
+        if failed_for_portfolio:
+            st.warning(f"Refreshing portfolio matches failed (task #{last_match['id']}); links are queried on demand until portfolio.csv changes or jobs are re-indexed.")
+        elif not pipeline_active:
+            submit_task('match', {'portfolio_file': portfolio.file_path, 'portfolio_fingerprint': current_portfolio})
+    companies = load_companies(JOBS_DB)
     if companies:
         selected_company = st.selectbox("Select a Company", companies)
-        if selected_company and jobs_cache[selected_company]:
-            job_titles = [job['title'] for job in jobs_cache[selected_company]]
-            selected_job = st.selectbox("Select a Position", job_titles)
-            if selected_job:
-                job_data = next(job for job in jobs_cache[selected_company] if job['title'] == selected_job)
+        # Reposts are hidden so extraction and generation run once per cluster
+        job_titles = dict(load_job_titles(selected_company, JOBS_DB, representatives_only=True)) if selected_company else {}
+        if job_titles:
+            selected_job_id = st.selectbox("Select a Position", list(job_titles), format_func=job_titles.get)
+            if selected_job_id:
+                # Only the selected job's description is read from the store
+                job_data = load_job(selected_job_id, JOBS_DB)
+                selected_job = job_data['title']
                 st.write(f"**Job Title**: {job_data['title']}")
                 st.write(f"**Company**: {selected_company}")
                 st.write(f"**Description**: {job_data.get('description', 'No description available')[:500]}...")
                 st.write(f"**Job URL**: [{job_data.get('job_url', 'No URL available')}]")
 
                 chain = Chain()
-                cleaned_desc = sanitize_text(job_data.get('description', ''))
-                extracted = chain.extract_jobs(cleaned_desc)
-                skills = extracted[0].get('skills', []) if extracted and isinstance(extracted, list) and len(extracted) > 0 else []
-                # Extract skills from description if empty
-                if not skills:
-                    prompt_skills_fallback = PromptTemplate.from_template(
-                        """
-                        Extract a list of 5-10 technical skills and qualifications from this job description: {desc}
-                        Return ONLY a JSON array like ["skill1", "skill2"]. No preamble.
-                        """
-                    )
-                    chain_fallback = prompt_skills_fallback | chain.llm
-                    fallback_res = chain_fallback.invoke({"desc": cleaned_desc})
-                    try:
-                        json_parser = JsonOutputParser()
-                        skills = json_parser.parse(fallback_res.content)
-                    except:
-                        skills = []  
-                    if not skills:
-                        # Default skills if no skills found
-                        skills = ["software development", "data engineering"]
+                # Skills stored by the enrich task first (it only stores confident matches), then resolve_skills,
+                # which calls the LLM when local coverage is low
+                if selected_job_id not in st.session_state.job_skills:
+                    stored_skills = [skill.strip() for skill in str(job_data.get('skills') or '').split(',') if skill.strip()]
+                    if stored_skills:
+                        st.session_state.job_skills[selected_job_id] = (stored_skills, None, 'stored')
+                    else:
+                        st.session_state.job_skills[selected_job_id] = resolve_skills(skill_extractor, chain, job_data.get('description', ''))
+                skills, skill_confidence, skill_source = st.session_state.job_skills[selected_job_id]
+                skills = list(skills)
+                coverage = f", coverage {skill_confidence:.0%}" if skill_confidence is not None else ""
+                st.caption(f"Skills ({skill_source}{coverage}): {', '.join(skills)}")
                 if not skills:
                     st.warning("No skills extracted from job description. Using default skills for portfolio query.")
                     skills = ["software development", "data engineering"]
 
-                portfolio_links = portfolio.query_links(skills, job_data.get('description', ''))
-                formatted_links = format_portfolio_links(portfolio_links)
+                # Precomputed match table first; fall back to an on-demand vector query for jobs not scored yet
+                formatted_links = lookup_links(selected_job_id, JOBS_DB)
+                if not formatted_links:
+                    portfolio_links = portfolio.query_links(skills, job_data.get('description', ''))
+                    formatted_links = format_portfolio_links(portfolio_links)
                 # Log retrieved links
                 with open('app/filter_log.txt', 'a') as f:
                     f.write(f"{datetime.now().isoformat()} - Retrieved portfolio links for {selected_company} '{selected_job}' skills {skills}: {formatted_links}\n")
@@ -235,9 +273,9 @@ if os.path.exists(jobs_cache_file):
                 if st.button("✉️ Generate Personalized Cold Email", key="batch_email_button"):
                     with st.spinner("Generating email..."):
                         try:
-                            email_body = chain.generate_mail(job=job_data, links=formatted_links, skills=skills)
+                            # Preview renders progressively while the email streams in
+                            email_body = st.write_stream(chain.stream_mail(job=job_data, links=formatted_links, skills=skills))
                             st.session_state.batch_email_body = email_body
-                            st.text_area("Email Preview:", value=email_body, height=300, disabled=True)
                         except Exception as e:
                             st.error(f"Error generating email: {e}")
 
@@ -257,3 +295,17 @@ if os.path.exists(jobs_cache_file):
         st.write("No companies available. Please scrape jobs first.")
 else:
     st.error("No job cache found. Please scrape jobs using one of the options above.")
+
+# Reverse lookup from the precomputed match table
+if os.path.exists(JOBS_DB):
+    st.subheader("Best-Fit Jobs for a Portfolio Item")
+    portfolio_items = dict((link, techskills) for techskills, link in portfolio_rows(portfolio.data))
+    selected_link = st.selectbox("Select a portfolio item", list(portfolio_items), format_func=lambda link: f"{portfolio_items[link]} ({link})")
+    fitting_jobs = jobs_for_link(selected_link, JOBS_DB)
+    if fitting_jobs:
+        st.dataframe(
+            pd.DataFrame([{'Company': company, 'Position': title, 'Score': round(score, 3)} for _, company, title, score in fitting_jobs]),
+            hide_index=True
+        )
+    else:
+        st.write("No precomputed matches yet. They are generated in the background after indexing.")
@@ -0,0 +1,144 @@
+import hashlib
+import re
+from contextlib import closing
+from datetime import datetime
+import numpy as np
+from job_store import connect, load_all_jobs, JOBS_DB, REPRESENTATIVE_FILTER
+from skills import SkillExtractor
+from metrics import record_cache
+
+TOP_K = 5
+
+MATCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS portfolio_matches (
+    job_id TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    link TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (job_id, rank)
+);
+CREATE INDEX IF NOT EXISTS idx_portfolio_matches_link ON portfolio_matches(link, score);
+CREATE TABLE IF NOT EXISTS match_fingerprints (
+    job_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS match_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _connect(db_path):
+    conn = connect(db_path)
+    conn.executescript(MATCH_SCHEMA)
+    return conn
+
+# Changes whenever portfolio.csv changes, which invalidates every stored match
+def portfolio_fingerprint(portfolio_csv):
+    with open(portfolio_csv, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+# Same query text Portfolio.query_links builds, so precomputed and on-demand links agree
+def match_query(skills, description):
+    skills_str = ", ".join(str(skill).strip() for skill in skills if str(skill).strip())
+    desc_snippet = description[:100].strip() if description else ""
+    if desc_snippet:
+        desc_snippet = f". Key context: {desc_snippet}"
+    return f"Required skills: {skills_str}{desc_snippet}"
+
+# (techskills, link) per portfolio row, recovering links that are glued to the skills column in some rows
+def portfolio_rows(data):
+    rows = []
+    for techskills, link in zip(data["Techskills"].tolist(), data["Links"].tolist()):
+        techskills = str(techskills)
+        if not isinstance(link, str):
+            found = re.search(r'https?://\S+', techskills)
+            if not found:
+                continue
+            link = found.group(0)
+            techskills = techskills.replace(link, '')
+        rows.append((techskills, link))
+    return rows
+
+def _job_skills(job, extractor):
+    skills = job.get('skills')
+    if isinstance(skills, str) and skills.strip():
+        return [skill.strip() for skill in skills.split(',') if skill.strip()]
+    skills, _ = extractor.extract(job.get('description', ''))
+    return skills or ["software development", "data engineering"]
+
+# Score every representative job against every portfolio row in one matrix product and keep the top-k links per job.
+# Only jobs whose query text changed are re-encoded, unless portfolio.csv changed.
+def precompute_matches(portfolio, db_path=JOBS_DB, top_k=TOP_K):
+    jobs = [job for company_jobs in load_all_jobs(db_path, representatives_only=True).values() for job in company_jobs]
+    extractor = SkillExtractor(portfolio_csv=portfolio.file_path)
+    queries = {job['job_id']: match_query(_job_skills(job, extractor), job.get('description', '')) for job in jobs}
+    fingerprints = {job_id: hashlib.sha1(query.encode('utf-8')).hexdigest() for job_id, query in queries.items()}
+    current_portfolio = portfolio_fingerprint(portfolio.file_path)
+
+    with closing(_connect(db_path)) as conn, conn:
+        row = conn.execute("SELECT value FROM match_meta WHERE key = 'portfolio'").fetchone()
+        portfolio_changed = row is None or row['value'] != current_portfolio
+        if portfolio_changed:
+            conn.execute("DELETE FROM portfolio_matches")
+            conn.execute("DELETE FROM match_fingerprints")
+        stored = {r['job_id']: r['fingerprint'] for r in conn.execute("SELECT job_id, fingerprint FROM match_fingerprints")}
+
+        # Jobs that left the cache or became reposts lose their matches
+        removed = [job_id for job_id in stored if job_id not in fingerprints]
+        conn.executemany("DELETE FROM portfolio_matches WHERE job_id = ?", [(job_id,) for job_id in removed])
+        conn.executemany("DELETE FROM match_fingerprints WHERE job_id = ?", [(job_id,) for job_id in removed])
+
+        changed = [job_id for job_id, fingerprint in fingerprints.items() if stored.get(job_id) != fingerprint]
+        if changed:
+            techskills, links = zip(*portfolio_rows(portfolio.data))
+            portfolio_embeddings = portfolio.embedding_model.encode(
+                list(techskills), convert_to_numpy=True, normalize_embeddings=True)
+            job_embeddings = portfolio.embedding_model.encode(
+                [queries[job_id] for job_id in changed], batch_size=64, convert_to_numpy=True, normalize_embeddings=True)
+            scores = job_embeddings @ portfolio_embeddings.T
+            k = min(top_k, len(links))
+            top = np.argsort(-scores, axis=1)[:, :k]
+            conn.executemany("DELETE FROM portfolio_matches WHERE job_id = ?", [(job_id,) for job_id in changed])
+            conn.executemany(
+                "INSERT INTO portfolio_matches (job_id, rank, link, score) VALUES (?, ?, ?, ?)",
+                [(job_id, rank, links[col], float(scores[i, col]))
+                 for i, job_id in enumerate(changed) for rank, col in enumerate(top[i])]
+            )
+            conn.executemany("INSERT OR REPLACE INTO match_fingerprints (job_id, fingerprint) VALUES (?, ?)",
+                             [(job_id, fingerprints[job_id]) for job_id in changed])
+        conn.execute("INSERT OR REPLACE INTO match_meta (key, value) VALUES ('portfolio', ?)", (current_portfolio,))
+
+    stats = {'jobs': len(jobs), 'recomputed': len(changed), 'removed': len(removed), 'portfolio_changed': portfolio_changed}
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Precomputed portfolio matches: {stats}\n")
+    return stats
+
+# True when portfolio.csv changed or some representative job has no stored matches yet
+def matches_stale(portfolio_csv, db_path=JOBS_DB):
+    with closing(_connect(db_path)) as conn:
+        row = conn.execute("SELECT value FROM match_meta WHERE key = 'portfolio'").fetchone()
+        if row is None or row['value'] != portfolio_fingerprint(portfolio_csv):
+            return True
+        missing = conn.execute(
+            f"SELECT COUNT(*) AS n FROM jobs j WHERE {REPRESENTATIVE_FILTER} "
+            "AND NOT EXISTS (SELECT 1 FROM match_fingerprints m WHERE m.job_id = j.job_id)"
+        ).fetchone()
+    return missing['n'] > 0
+
+# Top links for one job, best first; empty when the job has not been precomputed
+def lookup_links(job_id, db_path=JOBS_DB, limit=2):
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute("SELECT link FROM portfolio_matches WHERE job_id = ? ORDER BY rank LIMIT ?", (job_id, limit)).fetchall()
+    record_cache('portfolio_matches', bool(rows))
+    return [row['link'] for row in rows]
+
+# Reverse query: jobs that best fit one portfolio link, as (job_id, company, title, score)
+def jobs_for_link(link, db_path=JOBS_DB, limit=10):
+    with closing(_connect(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT m.job_id, j.company, j.title, m.score FROM portfolio_matches m JOIN jobs j ON j.job_id = m.job_id "
+            "WHERE m.link = ? ORDER BY m.score DESC LIMIT ?",
+            (link, limit)
+        ).fetchall()
+    return [(row['job_id'], row['company'], row['title'], row['score']) for row in rows]
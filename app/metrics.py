@@ -0,0 +1,216 @@
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Instrumentation is switched on with COLD_EMAIL_METRICS=1; when off, timed() returns functions unchanged
+ENABLED = os.getenv('COLD_EMAIL_METRICS', '0').lower() in ('1', 'true', 'yes')
+METRICS_PORT = int(os.getenv('COLD_EMAIL_METRICS_PORT', '9464'))
+SNAPSHOT_DIR = os.getenv('COLD_EMAIL_METRICS_DIR', 'app/data/metrics')
+SNAPSHOT_INTERVAL = 15
+# Seconds; wide enough for an SMTP round trip at the low end and a full company scrape at the top
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+PREFIX = 'cold_email_'
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_exporters_started = False
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(LATENCY_BUCKETS), 'count': 0, 'sum': 0.0}
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                histogram['buckets'][i] += 1
+        histogram['count'] += 1
+        histogram['sum'] += value
+
+@contextmanager
+def _span(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    # Exception, not BaseException: an abandoned stream (GeneratorExit) or a cancelled task is not an error
+    except Exception as e:
+        inc('errors_total', stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+# Time a block as one stage; a shared no-op context when metrics are off
+def span(stage):
+    return _span(stage) if ENABLED else nullcontext()
+
+# Time every call of a function (generators are timed until exhausted) under one stage name
+def timed(stage):
+    def decorate(func):
+        if not ENABLED:
+            return func
+        if inspect.isgeneratorfunction(func):
+            @wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                with _span(stage):
+                    yield from func(*args, **kwargs)
+            return generator_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# Errors that the instrumented code catches and does not re-raise (scrape failures, SMTP errors);
+# re-raised errors are already counted by the enclosing span
+def record_error(stage, error):
+    inc('errors_total', stage=stage, error=type(error).__name__)
+
+# Token usage from a LangChain message: usage_metadata when the provider fills it, else Groq/OpenAI token_usage
+def record_tokens(stage, message):
+    if not ENABLED or message is None:
+        return
+    usage = getattr(message, 'usage_metadata', None) or {}
+    prompt_tokens = usage.get('input_tokens')
+    completion_tokens = usage.get('output_tokens')
+    if prompt_tokens is None and completion_tokens is None:
+        token_usage = (getattr(message, 'response_metadata', None) or {}).get('token_usage') or {}
+        prompt_tokens = token_usage.get('prompt_tokens')
+        completion_tokens = token_usage.get('completion_tokens')
+    if prompt_tokens:
+        inc('llm_tokens_total', prompt_tokens, stage=stage, type='prompt')
+    if completion_tokens:
+        inc('llm_tokens_total', completion_tokens, stage=stage, type='completion')
+
+def record_cache(cache, hit):
+    inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{str(value)}"' for name, value in pairs) + '}'
+
+# Prometheus text exposition format
+def render_prometheus():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {'buckets': list(h['buckets']), 'count': h['count'], 'sum': h['sum']} for key, h in _histograms.items()}
+    lines = []
+    for metric in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{metric} counter")
+        for (name, labels), value in sorted(counters.items()):
+            if name == metric:
+                lines.append(f"{PREFIX}{name}{_label_text(labels)} {value}")
+    for metric in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{metric} histogram")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name != metric:
+                continue
+            for bound, count in zip(LATENCY_BUCKETS, histogram['buckets']):
+                lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', bound)])} {count}")
+            lines.append(f"{PREFIX}{name}_bucket{_label_text(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{PREFIX}{name}_sum{_label_text(labels)} {histogram['sum']:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_label_text(labels)} {histogram['count']}")
+    return '\n'.join(lines) + '\n'
+
+# JSON view of the same data, with cache hit rates and mean latencies precomputed
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: dict(h) for key, h in _histograms.items()}
+    stages = {}
+    for (name, labels), histogram in histograms.items():
+        if name == 'stage_seconds':
+            stage = dict(labels)['stage']
+            stages[stage] = {'count': histogram['count'], 'total_seconds': round(histogram['sum'], 4),
+                             'mean_seconds': round(histogram['sum'] / histogram['count'], 4) if histogram['count'] else None}
+    caches = {}
+    tokens = {}
+    errors = {}
+    for (name, labels), value in counters.items():
+        labels = dict(labels)
+        if name == 'cache_requests_total':
+            caches.setdefault(labels['cache'], {'hit': 0, 'miss': 0})[labels['result']] += value
+        elif name == 'llm_tokens_total':
+            tokens.setdefault(labels['stage'], {})[labels['type']] = value
+        elif name == 'errors_total':
+            errors[f"{labels['stage']}:{labels['error']}"] = value
+    for counts in caches.values():
+        total = counts['hit'] + counts['miss']
+        counts['hit_rate'] = round(counts['hit'] / total, 4) if total else None
+    return {'timestamp': datetime.now().isoformat(), 'pid': os.getpid(),
+            'stages': stages, 'llm_tokens': tokens, 'caches': caches, 'errors': errors}
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port=METRICS_PORT, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# Periodically write snapshot() to <dir>/<name>-<pid>.json so each worker process reports separately
+def start_snapshot_writer(name, directory=SNAPSHOT_DIR, interval=SNAPSHOT_INTERVAL):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{os.getpid()}.json")
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                with open(path + '.tmp', 'w') as f:
+                    json.dump(snapshot(), f, indent=2)
+                os.replace(path + '.tmp', path)
+            except Exception as e:
+                with open('app/filter_log.txt', 'a') as f:
+                    f.write(f"{datetime.now().isoformat()} - Error writing metrics snapshot {path}: {e}\n")
+
+    threading.Thread(target=run, daemon=True).start()
+    return path
+
+# Start exporters once per process; only the app serves HTTP, worker processes write snapshot files
+def start_exporters(name, serve_http=False):
+    global _exporters_started
+    if not ENABLED or _exporters_started:
+        return
+    _exporters_started = True
+    start_snapshot_writer(name)
+    if serve_http:
+        try:
+            start_http_server()
+        except OSError as e:
+            with open('app/filter_log.txt', 'a') as f:
+                f.write(f"{datetime.now().isoformat()} - Metrics endpoint not started on port {METRICS_PORT}: {e}\n")
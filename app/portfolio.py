@@ -2,6 +2,8 @@ import pandas as pd
 import chromadb
 import uuid
 from sentence_transformers import SentenceTransformer
+from datetime import datetime
+from metrics import timed, span, record_error
 
 class Portfolio:
     def __init__(self, file_path="app/resource/portfolio.csv"):
@@ -30,6 +32,7 @@ class Portfolio:
                 )
 
 # Query top 5 links from the portfolio vector store that matches job description
+    @timed('query_links')
     def query_links(self, skills, description=""):
         try:
             valid_skills = [str(skill).strip() for skill in skills if str(skill).strip()]
@@ -44,17 +47,41 @@ class Portfolio:
             
             # Build query string
             query_str = f"Required skills: {skills_str}{desc_snippet}"
-            query_embedding = self.embedding_model.encode([query_str]).tolist()[0]
+            with span('portfolio_encode'):
+                query_embedding = self.embedding_model.encode([query_str]).tolist()[0]
             
             # Query
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=5
-            )
+            with span('portfolio_vector_query'):
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=5
+                )
             metadatas = results.get('metadatas', [[]])[0]
             return [metadatas]  
         except Exception as e:
-            from datetime import datetime
+            record_error('query_links', e)
             with open('app/filter_log.txt', 'a') as f:
                 f.write(f"{datetime.now().isoformat()} - Error querying portfolio links: {e}\n")
-            return []
\ No newline at end of file
+            return []
+
+# Format portfolio links from ChromaDB query to match prompt structure
+def format_portfolio_links(portfolio_links):
+    if not portfolio_links:
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Warning: No portfolio links returned from query\n")
+        return []
+    flattened_links = []
+    for meta_list in portfolio_links:
+        for meta in meta_list:
+            if isinstance(meta, dict) and 'links' in meta and isinstance(meta['links'], str):
+                flattened_links.append(meta['links'])
+    if not flattened_links:
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Warning: No valid portfolio links in query result\n")
+        return []
+    # Top 2 most relevant
+    selected_links = flattened_links[:2]
+    if len(selected_links) < 2:
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Only {len(selected_links)} portfolio links available (wanted 2); check query relevance\n")
+    return selected_links
@@ -1,10 +1,16 @@
+import hashlib
 import json
+import re
+import time
+from collections import Counter
 from utils import sanitize_text
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from langchain.docstore.document import Document
 from datetime import datetime
+from job_store import load_all_jobs, JOBS_DB
+from metrics import timed, span
 
 # Clean metadata for database compatibility
 def simplify_metadata(metadata):
@@ -16,14 +22,61 @@ def simplify_metadata(metadata):
             simple_metadata[key] = str(value)
     return simple_metadata
 
-# Load JSON, clean, split and embed into a new Chroma collection
-def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chroma_jobs_db'):
+# Lines shorter than this are headings or fragments and never count as boilerplate
+MIN_BOILERPLATE_WORDS = 8
+
+def description_lines(description):
+    return [line for line in re.split(r'\n+', str(description)) if line.strip()]
+
+def boilerplate_key(line):
+    return sanitize_text(line).lower()
+
+# Learn per company which description lines (EEO, benefits, "about us") repeat across many of its postings
+def learn_boilerplate(descriptions_by_company, min_jobs=3, min_share=0.3):
+    boilerplate = {}
+    for company, descriptions in descriptions_by_company.items():
+        line_counts = Counter()
+        for description in descriptions:
+            line_counts.update({boilerplate_key(line) for line in description_lines(description)
+                                if len(line.split()) >= MIN_BOILERPLATE_WORDS})
+        threshold = max(min_jobs, min_share * len(descriptions))
+        boilerplate[company] = {key for key, count in line_counts.items() if count >= threshold}
+    return boilerplate
+
+# Drop a company's boilerplate lines; a posting made only of boilerplate keeps its full text
+def strip_boilerplate(description, boilerplate_keys):
+    if not boilerplate_keys:
+        return description
+    kept = [line for line in description_lines(description) if boilerplate_key(line) not in boilerplate_keys]
+    return ' '.join(kept) if kept else description
+
+# Load the job store (or a legacy JSON file), strip boilerplate, split and embed into a new Chroma collection
+@timed('preprocess_and_embed')
+def preprocess_and_embed(jobs_file=JOBS_DB, persist_dir='chroma_jobs_db'):
     try:
-        with open(jobs_file, 'r') as f:
-            all_jobs = json.load(f)
+        if jobs_file.endswith('.db'):
+            # One representative per near-duplicate cluster is embedded
+            all_jobs = load_all_jobs(jobs_file, representatives_only=True)
+        else:
+            with open(jobs_file, 'r') as f:
+                all_jobs = json.load(f)
         
         documents = []
         skipped_jobs = []
+
+        # Learn boilerplate before chunking so it is embedded once per company instead of once per job
+        if isinstance(all_jobs, dict):
+            descriptions_by_company = {company: [job['description'] for job in jobs if isinstance(job, dict) and isinstance(job.get('description'), str)]
+                                       for company, jobs in all_jobs.items() if isinstance(jobs, list)}
+        elif isinstance(all_jobs, list):
+            descriptions_by_company = {}
+            for job in all_jobs:
+                if isinstance(job, dict) and isinstance(job.get('description'), str):
+                    descriptions_by_company.setdefault(str(job.get('company', 'Unknown')), []).append(job['description'])
+        else:
+            descriptions_by_company = {}
+        boilerplate = learn_boilerplate(descriptions_by_company)
+        full_descriptions = []
         
         # BATCH SCRAPE
         if isinstance(all_jobs, dict):
@@ -41,10 +94,11 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
                     if not isinstance(job.get('description'), str) or not job.get('description'):
                         skipped_jobs.append((company, job.get('title', 'Unknown'), 'Invalid or missing description'))
                         continue
-                    cleaned_desc = sanitize_text(job.get('description'))
+                    cleaned_desc = sanitize_text(strip_boilerplate(job.get('description'), boilerplate.get(company)))
                     if not isinstance(cleaned_desc, str) or not cleaned_desc:
                         skipped_jobs.append((company, job.get('title', 'Unknown'), 'Empty or invalid description after cleaning'))
                         continue
+                    full_descriptions.append(sanitize_text(job.get('description')))
                     skills = job.get('skills', '')
                     if isinstance(skills, str):
                         skills = [s.strip() for s in skills.split(',') if s.strip()]
@@ -60,7 +114,8 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
                             'title': job.get('title', ''),
                             'url': str(job.get('job_url', '')),
                             'experience': str(job.get('experience', 'Not specified')),
-                            'skills': skills_str  # Store as string
+                            'skills': skills_str,  # Store as string
+                            'kind': 'job'
                         }
                     )
                     documents.append(doc)
@@ -76,10 +131,11 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
                 if not isinstance(job.get('description'), str) or not job.get('description'):
                     skipped_jobs.append(('Unknown', job.get('title', 'Unknown'), 'Invalid or missing description'))
                     continue
-                cleaned_desc = sanitize_text(job.get('description'))
+                cleaned_desc = sanitize_text(strip_boilerplate(job.get('description'), boilerplate.get(str(job.get('company', 'Unknown')))))
                 if not isinstance(cleaned_desc, str) or not cleaned_desc:
                     skipped_jobs.append(('Unknown', job.get('title', 'Unknown'), 'Empty or invalid description after cleaning'))
                     continue
+                full_descriptions.append(sanitize_text(job.get('description')))
                 skills = job.get('skills', '')
                 if isinstance(skills, str):
                     skills = [s.strip() for s in skills.split(',') if s.strip()]
@@ -95,7 +151,8 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
                         'title': job.get('title', ''),
                         'url': str(job.get('job_url', '')),
                         'experience': str(job.get('experience', 'Not specified')),
-                        'skills': skills_str  # Store as string
+                        'skills': skills_str,  # Store as string
+                        'kind': 'job'
                     }
                 )
                 documents.append(doc)
@@ -114,8 +171,18 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
                 f.write(f"{datetime.now().isoformat()} - No valid jobs to process after filtering.\n")
             return
         
+        # Each company's boilerplate is shared as a single document instead of repeating in every job's chunks
+        for company, keys in boilerplate.items():
+            if keys:
+                documents.append(Document(
+                    page_content=' '.join(sorted(keys)),
+                    metadata={'company': str(company), 'title': f"{company} shared boilerplate", 'url': '',
+                              'experience': '', 'skills': '', 'kind': 'boilerplate'}
+                ))
+
         text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         splits = text_splitter.split_documents(documents)
+        chunks_without_stripping = sum(len(text_splitter.split_text(description)) for description in full_descriptions)
         
         # Validate splits are Documents
         valid_splits = []
@@ -151,14 +218,45 @@ def preprocess_and_embed(jobs_file='app/data/jobs_cache.json', persist_dir='chro
         
         embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
         
-        vectorstore = Chroma.from_documents(
-            documents=filtered_splits,
-            embedding=embeddings,
-            persist_directory=persist_dir,
-            collection_name="fortune_jobs"
-        )
-        
-        print(f"Embedded {len(filtered_splits)} job chunks for {len(all_jobs)} companies.")
+        # Deterministic ids per job chunk and per company boilerplate document
+        ids = []
+        chunk_numbers = Counter()
+        for doc in filtered_splits:
+            source = f"{doc.metadata.get('kind', 'job')}|{doc.metadata.get('company', '')}|{doc.metadata.get('url', '')}|{doc.metadata.get('title', '')}"
+            ids.append(f"{hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]}-{chunk_numbers[source]}")
+            chunk_numbers[source] += 1
+
+        embed_start = time.perf_counter()
+        with span('embed_documents'):
+            # Every run embeds the whole job store, so the collection is replaced rather than appended to;
+            # appending would duplicate every chunk and boilerplate document on each re-index
+            Chroma(collection_name="fortune_jobs", embedding_function=embeddings, persist_directory=persist_dir).delete_collection()
+            vectorstore = Chroma.from_documents(
+                documents=filtered_splits,
+                embedding=embeddings,
+                ids=ids,
+                persist_directory=persist_dir,
+                collection_name="fortune_jobs"
+            )
+        embed_seconds = time.perf_counter() - embed_start
+
+        # Savings are estimated from the measured per-chunk embedding time
+        chunks_saved = chunks_without_stripping - len(filtered_splits)
+        stats = {
+            'jobs': len(full_descriptions),
+            'chunks': len(filtered_splits),
+            'chunks_without_stripping': chunks_without_stripping,
+            'chunks_saved': chunks_saved,
+            'index_size': vectorstore._collection.count(),
+            'boilerplate_lines': sum(len(keys) for keys in boilerplate.values()),
+            'embed_seconds': round(embed_seconds, 2),
+            'embed_seconds_saved': round(chunks_saved * embed_seconds / len(filtered_splits), 2)
+        }
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Boilerplate stripping: {stats}\n")
+        print(f"Embedded {len(filtered_splits)} job chunks for {len(all_jobs)} companies "
+              f"({chunks_saved} chunks and ~{stats['embed_seconds_saved']}s saved by boilerplate stripping).")
+        return stats
     except Exception as e:
         print(f"Error in preprocessing: {e}")
         with open('app/filter_log.txt', 'a') as f:
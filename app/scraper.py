@@ -4,6 +4,37 @@ import pandas as pd
 from datetime import datetime
 import time
 import re
+from job_store import save_jobs, JOBS_DB
+from dedup import dedupe_jobs
+from metrics import timed, record_error
+
+# Software-focused keywords
+SOFTWARE_KEYWORDS = [
+    "software", "developer", "data science", "data scientist", "data engineer",
+    "devops", "programmer", "cloud", "ai", "machine learning","ml", "llm", "llms",
+    "react", "node.js", "mongodb", "angular", ".net", "sql server",
+    "vue.js", "ruby on rails", "postgresql", "python", "django", "mysql",
+    "java", "spring boot", "oracle", "flutter", "firebase", "graphql",
+    "wordpress", "php", "magento", "react native", "ios", "swift",
+    "core data", "android", "room persistence", "kotlin", "android tv",
+    "android ndk", "arkit", "cross-platform", "xamarin", "azure",
+    "typescript", "express.js", "tensorflow", "jenkins", "docker",
+    "full stack", "backend", "frontend", "database", "cybersecurity",
+    "network engineer", "systems developer", "qa engineer", "test automation",
+    "automation engineer", "site reliability", "sre", "infrastructure developer",
+    "artificial intelligence", "ml engineer", "software development",
+    "web developer", "application developer", "app", "engineer"
+]
+# Exclusions for non-software keywords
+NON_SOFTWARE_KEYWORDS = [
+    "pharmacy", "pharmacist", "technician", "retail", "store", "associate",
+    "cashier", "clerk", "sales", "customer service", "warehouse", "driver",
+    "delivery", "healthcare", "nurse", "medical", "manufacturing", "mechanical",
+    "civil", "electrical", "chemical", "biomedical", "industrial", "cake decorator",
+    "safety specialist", "loss prevention", "asset protection", "customer host",
+    "health & beauty", "fashion team", "backroom team", "car wash", "packaging engineer",
+    "tax analyst", "claims specialist", "team supervisor"
+]
 
 # Normalize text by converting to lowercase, removing punctuation, and collapsing spaces
 def normalize_text(text):
@@ -15,6 +46,7 @@ def normalize_text(text):
     return text
 
 # Scrape up to 50 jobs for a company
+@timed('scrape_company_jobs')
 def scrape_company_jobs(company_name, num_pages=2):
     try:
         # Alternative search terms for companies
@@ -50,41 +82,13 @@ def scrape_company_jobs(company_name, num_pages=2):
                 f.write(f"{datetime.now().isoformat()} - {company_name}: No jobs scraped\n")
             return []
         
-        # Software-focused keywords
-        software_keywords = [
-            "software", "developer", "data science", "data scientist", "data engineer",
-            "devops", "programmer", "cloud", "ai", "machine learning","ml", "llm", "llms",
-            "react", "node.js", "mongodb", "angular", ".net", "sql server",
-            "vue.js", "ruby on rails", "postgresql", "python", "django", "mysql",
-            "java", "spring boot", "oracle", "flutter", "firebase", "graphql",
-            "wordpress", "php", "magento", "react native", "ios", "swift",
-            "core data", "android", "room persistence", "kotlin", "android tv",
-            "android ndk", "arkit", "cross-platform", "xamarin", "azure",
-            "typescript", "express.js", "tensorflow", "jenkins", "docker",
-            "full stack", "backend", "frontend", "database", "cybersecurity",
-            "network engineer", "systems developer", "qa engineer", "test automation",
-            "automation engineer", "site reliability", "sre", "infrastructure developer",
-            "artificial intelligence", "ml engineer", "software development",
-            "web developer", "application developer", "app", "engineer"
-        ]
-        # Exclusions for non-software keywords
-        non_software_keywords = [
-            "pharmacy", "pharmacist", "technician", "retail", "store", "associate",
-            "cashier", "clerk", "sales", "customer service", "warehouse", "driver",
-            "delivery", "healthcare", "nurse", "medical", "manufacturing", "mechanical",
-            "civil", "electrical", "chemical", "biomedical", "industrial", "cake decorator",
-            "safety specialist", "loss prevention", "asset protection", "customer host",
-            "health & beauty", "fashion team", "backroom team", "car wash", "packaging engineer",
-            "tax analyst", "claims specialist", "team supervisor"
-        ]
-
         # Filtering Tech Jobs by atleast one software keyword in title OR description
         def is_software_job(row):
             title = normalize_text(row.get('title', ''))
             desc = normalize_text(row.get('description', ''))
-            matched_software = [k for k in software_keywords if k in title or k in desc]
+            matched_software = [k for k in SOFTWARE_KEYWORDS if k in title or k in desc]
             has_software = len(matched_software) >= 1
-            non_software_found = [k for k in non_software_keywords if k in title]
+            non_software_found = [k for k in NON_SOFTWARE_KEYWORDS if k in title]
             no_non_software = not non_software_found
             reason = "Passed"
             if not has_software:
@@ -128,13 +132,14 @@ def scrape_company_jobs(company_name, num_pages=2):
                 f.write(f"No software jobs found for {company_name}. Sample titles: {all_titles}\n")
         return filtered_jobs
     except Exception as e:
+        record_error('scrape_company_jobs', e)
         print(f"Error scraping {company_name}: {e}")
         with open('app/filter_log.txt', 'a') as f:
             f.write(f"{datetime.now().isoformat()} - Error scraping {company_name}: {e}\n")
         return []
 
-# Save the scraped jobs as batches to JSON
-def batch_scrape(companies_file='app/data/companies.json', batch_size=50):
+# Save the scraped jobs as batches to the job store
+def batch_scrape(companies_file='app/data/companies.json', batch_size=50, delay=5, store_file=JOBS_DB, progress=None):
     try:
         with open(companies_file, 'r') as f:
             companies = json.load(f)['companies']
@@ -150,13 +155,19 @@ def batch_scrape(companies_file='app/data/companies.json', batch_size=50):
                 all_jobs[comp['name']] = jobs
                 if not jobs:
                     print(f"Warning: No software jobs found for {comp['name']}. This is normal for non-tech companies. Check app/filter_log.txt and app/raw_jobs_log.txt.")
+                # Background tasks report progress here; a cancelled task raises out of the callback
+                if progress:
+                    progress(len(all_jobs) / total_companies, f"Scraped {comp['name']} ({len(all_jobs)} of {total_companies} companies)")
                 # 5-second delay to avoid rate limiting
-                time.sleep(5)
+                time.sleep(delay)
                   
-            with open('app/data/jobs_cache.json', 'w') as f:
-                json.dump(all_jobs, f, indent=2, default=str)
-            print(f"Batch {i//batch_size + 1} saved to jobs_cache.json")
-        
+            # Only this batch's companies are written; the first batch replaces the previous run
+            save_jobs({comp['name']: all_jobs[comp['name']] for comp in batch_companies}, db_path=store_file, clear=(i == 0))
+            print(f"Batch {i//batch_size + 1} saved to {store_file}")
+
+        # Reposts under other URLs, locations or search terms collapse to one representative per cluster
+        clusters = dedupe_jobs(db_path=store_file)
+        print(f"Near-duplicate detection kept {len(set(clusters.values()))} of {len(clusters)} jobs.")
         return all_jobs
     except Exception as e:
         print(f"Error in batch scrape: {e}")
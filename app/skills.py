@@ -0,0 +1,159 @@
+import csv
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from scraper import SOFTWARE_KEYWORDS
+from utils import sanitize_text
+
+PORTFOLIO_CSV = 'app/resource/portfolio.csv'
+# Number of distinct skills treated as full coverage; the prompts ask the LLM for 5-10
+TARGET_SKILLS = 5
+MIN_CONFIDENCE = 0.6
+MAX_SKILLS = 10
+
+# Canonical skill -> alternative spellings seen in postings
+SKILL_SYNONYMS = {
+    "machine learning": ["ml", "machine-learning"],
+    "artificial intelligence": ["ai"],
+    "llm": ["llms", "large language model", "large language models", "generative ai", "genai"],
+    "aws": ["amazon web services"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "azure": ["microsoft azure"],
+    "kubernetes": ["k8s"],
+    "javascript": ["js", "ecmascript"],
+    "node.js": ["nodejs"],
+    "react": ["reactjs", "react.js"],
+    "vue.js": ["vue", "vuejs"],
+    "angular": ["angularjs"],
+    "express.js": ["expressjs"],
+    ".net": ["dotnet", "asp.net"],
+    "c#": ["csharp"],
+    "c++": ["cpp"],
+    "golang": ["go lang"],
+    "postgresql": ["postgres"],
+    "sql": ["t-sql", "pl/sql"],
+    "nosql": ["no-sql"],
+    "ci/cd": ["cicd", "continuous integration", "continuous delivery", "continuous deployment"],
+    "site reliability": ["sre", "site reliability engineering"],
+    "full stack": ["full-stack", "fullstack"],
+    "backend": ["back-end", "back end"],
+    "frontend": ["front-end", "front end"],
+    "cybersecurity": ["cyber security", "information security", "infosec"],
+    "data science": ["data scientist"],
+    "data engineering": ["data engineer", "data pipelines", "etl"],
+    "rest api": ["rest apis", "restful", "restful apis"],
+    "microservices": ["microservice", "micro-services"],
+    "test automation": ["automated testing", "automation testing"],
+}
+
+# Common technologies missing from the scraper keyword list and the portfolio
+EXTRA_SKILLS = [
+    "sql", "nosql", "spark", "hadoop", "kafka", "airflow", "snowflake", "databricks", "tableau", "power bi",
+    "pytorch", "scikit-learn", "pandas", "terraform", "ansible", "linux", "git", "scala", "rust", "ruby",
+    "html", "css", "redis", "elasticsearch", "graphql", "computer vision", "nlp", "deep learning",
+    "agile", "scrum", "microservices", "rest api", "ci/cd", "data engineering",
+]
+
+# Role words from the scraper keyword list that say nothing about required skills
+GENERIC_TERMS = {"software", "app", "software development", "cross-platform"}
+ROLE_SUFFIXES = ("engineer", "developer", "programmer", "scientist")
+
+# Skills that are also everyday words ("swift resolution", "react quickly", "cloud storage at home").
+# They are still reported but never count toward confidence, so they cannot suppress the LLM fallback
+AMBIGUOUS_SKILLS = {"swift", "react", "spark", "rust", "ruby", "flutter", "cloud", "database", "oracle"}
+# Of those, the ones postings write as proper nouns only match when capitalized ("Swift", not "swift")
+PROPER_NOUN_SKILLS = {"swift", "react", "spark", "rust", "ruby", "flutter"}
+
+# Words keep the dots, plus and hash signs that are part of skill names (.net, node.js, c++, c#);
+# a sentence-ending period is not part of the word
+SKILL_TOKEN = re.compile(r'\.?[A-Za-z0-9+#]+(?:\.[A-Za-z0-9+#]+)*')
+
+def skill_tokens(text):
+    return SKILL_TOKEN.findall(str(text))
+
+def normalize_skill_text(text):
+    return ' '.join(token.lower() for token in skill_tokens(text))
+
+def load_portfolio_skills(portfolio_csv=PORTFOLIO_CSV):
+    skills = []
+    with open(portfolio_csv, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            # Some rows have the link glued to the last skill
+            techskills = re.sub(r'https?://\S+', '', row.get('Techskills') or '')
+            skills.extend(skill.strip() for skill in techskills.split(',') if skill.strip())
+    return skills
+
+# Dictionary-based skill matcher with a coverage score; descriptions are matched by n-gram lookup, not regex alternation
+class SkillExtractor:
+    def __init__(self, portfolio_csv=PORTFOLIO_CSV, min_confidence=MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.phrases = {}
+        # Synonyms go in first so every spelling of a skill reports the same canonical name
+        for canonical, aliases in SKILL_SYNONYMS.items():
+            for alias in [canonical] + aliases:
+                self._add(alias, canonical)
+        terms = list(SOFTWARE_KEYWORDS) + list(EXTRA_SKILLS) + load_portfolio_skills(portfolio_csv)
+        for term in terms:
+            term = term.strip()
+            if term.lower() in GENERIC_TERMS or term.lower().endswith(ROLE_SUFFIXES):
+                continue
+            self._add(term, term.lower())
+        # Longest phrase per leading token; tokens that start no phrase are skipped with one dict lookup
+        self.max_ngram = {}
+        for phrase in self.phrases:
+            self.max_ngram[phrase[0]] = max(self.max_ngram.get(phrase[0], 0), len(phrase))
+        self.stats = {'local': 0, 'llm': 0, 'local_seconds': 0.0, 'llm_seconds': 0.0}
+
+    def _add(self, phrase, canonical):
+        key = tuple(normalize_skill_text(phrase).split())
+        if key:
+            self.phrases.setdefault(key, canonical)
+
+    # Returns (skills ranked by mention count, confidence in [0, 1] from the unambiguous skills)
+    def extract(self, text):
+        raw_tokens = skill_tokens(text)
+        tokens = [token.lower() for token in raw_tokens]
+        counts = Counter()
+        first_seen = {}
+        longest_for = self.max_ngram.get
+        phrase_for = self.phrases.get
+        total = len(tokens)
+        i = 0
+        while i < total:
+            longest = longest_for(tokens[i])
+            step = 1
+            if longest:
+                # Longest match wins and consumes its tokens, so "react native" is not also counted as "react"
+                for n in range(min(longest, total - i), 0, -1):
+                    skill = phrase_for(tuple(tokens[i:i + n]))
+                    if skill in PROPER_NOUN_SKILLS and tokens[i] == skill and not raw_tokens[i][0].isupper():
+                        continue
+                    if skill:
+                        counts[skill] += 1
+                        first_seen.setdefault(skill, i)
+                        step = n
+                        break
+            i += step
+        skills = sorted(counts, key=lambda skill: (-counts[skill], first_seen[skill]))[:MAX_SKILLS]
+        confidence = min(1.0, sum(1 for skill in skills if skill not in AMBIGUOUS_SKILLS) / TARGET_SKILLS)
+        return skills, confidence
+
+# Local skills first; the LLM is only asked when local coverage is below the confidence threshold
+def resolve_skills(extractor, chain, description):
+    start = time.perf_counter()
+    skills, confidence = extractor.extract(description)
+    extractor.stats['local_seconds'] += time.perf_counter() - start
+    if confidence >= extractor.min_confidence:
+        extractor.stats['local'] += 1
+        return skills, confidence, 'local'
+    start = time.perf_counter()
+    llm_skills = chain.extract_skills(sanitize_text(description))
+    extractor.stats['llm_seconds'] += time.perf_counter() - start
+    extractor.stats['llm'] += 1
+    # The LLM read the posting in context, so ambiguous local matches are not added to its answer
+    local_skills = [skill for skill in skills if skill not in AMBIGUOUS_SKILLS]
+    merged = list(dict.fromkeys([str(skill) for skill in llm_skills] + local_skills))[:MAX_SKILLS]
+    with open('app/filter_log.txt', 'a') as f:
+        f.write(f"{datetime.now().isoformat()} - Local skill coverage {confidence:.2f} below {extractor.min_confidence}, used LLM fallback: {merged}\n")
+    return merged, confidence, 'llm'
@@ -0,0 +1,323 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import closing
+from datetime import datetime
+from metrics import start_exporters
+
+TASKS_DB = 'app/data/tasks.db'
+POLL_INTERVAL = 2.0
+HEARTBEAT_INTERVAL = 10.0
+# A running task whose worker has not sent a heartbeat for this long is assumed crashed and requeued
+STALE_AFTER = 60.0
+ACTIVE_STATUSES = ('queued', 'running')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status, id);
+"""
+
+# Raised inside a task when cancellation was requested. Like asyncio.CancelledError it derives from
+# BaseException, so the broad `except Exception` handlers in the scrape/index code do not swallow it.
+class TaskCancelled(BaseException):
+    pass
+
+def connect(db_path=TASKS_DB):
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _task_dict(row):
+    if row is None:
+        return None
+    task = dict(row)
+    task['payload'] = json.loads(task['payload'])
+    task['result'] = json.loads(task['result']) if task['result'] else None
+    return task
+
+def submit(kind, payload=None, db_path=TASKS_DB, max_attempts=3):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown task kind: {kind}")
+    with closing(connect(db_path)) as conn:
+        cursor = conn.execute(
+            "INSERT INTO tasks (kind, payload, status, max_attempts, created_at) VALUES (?, ?, 'queued', ?, ?)",
+            (kind, json.dumps(payload or {}), max_attempts, time.time())
+        )
+        return cursor.lastrowid
+
+def get_task(task_id, db_path=TASKS_DB):
+    with closing(connect(db_path)) as conn:
+        return _task_dict(conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone())
+
+def list_tasks(limit=20, db_path=TASKS_DB):
+    with closing(connect(db_path)) as conn:
+        return [_task_dict(row) for row in conn.execute("SELECT * FROM tasks ORDER BY id DESC LIMIT ?", (limit,))]
+
+# Most recent task of one kind, or None
+def latest_task(kind, db_path=TASKS_DB):
+    with closing(connect(db_path)) as conn:
+        return _task_dict(conn.execute("SELECT * FROM tasks WHERE kind = ? ORDER BY id DESC LIMIT 1", (kind,)).fetchone())
+
+# Queued tasks are cancelled immediately; running tasks stop at their next progress update
+def cancel_task(task_id, db_path=TASKS_DB):
+    with closing(connect(db_path)) as conn:
+        conn.execute(
+            "UPDATE tasks SET status = 'cancelled', finished_at = ?, message = 'Cancelled before start' WHERE id = ? AND status = 'queued'",
+            (time.time(), task_id)
+        )
+        conn.execute("UPDATE tasks SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (task_id,))
+
+# Requeue (or fail, once attempts are used up) running tasks whose worker stopped sending heartbeats
+def recover_stale_tasks(conn, now=None):
+    now = now or time.time()
+    stale = conn.execute(
+        "SELECT id, attempts, max_attempts, worker_id FROM tasks WHERE status = 'running' AND heartbeat_at < ?",
+        (now - STALE_AFTER,)
+    ).fetchall()
+    for row in stale:
+        if row['attempts'] >= row['max_attempts']:
+            conn.execute("UPDATE tasks SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+                         (f"Worker {row['worker_id']} stopped responding; no attempts left", now, row['id']))
+        else:
+            conn.execute("UPDATE tasks SET status = 'queued', worker_id = NULL, message = ? WHERE id = ?",
+                         (f"Requeued after worker {row['worker_id']} stopped responding", row['id']))
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Recovered stale task {row['id']} from worker {row['worker_id']}\n")
+    return len(stale)
+
+# Atomically take the oldest queued task; safe across worker processes and app replicas sharing the database
+def claim_task(worker_id, db_path=TASKS_DB):
+    with closing(connect(db_path)) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            recover_stale_tasks(conn)
+            row = conn.execute("SELECT id FROM tasks WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE tasks SET status = 'running', worker_id = ?, attempts = attempts + 1, heartbeat_at = ?, "
+                "started_at = ?, progress = 0, message = 'Started', error = NULL WHERE id = ?",
+                (worker_id, now, now, row['id'])
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return _task_dict(conn.execute("SELECT * FROM tasks WHERE id = ?", (row['id'],)).fetchone())
+
+# Handed to task handlers for progress reporting and cooperative cancellation
+class TaskContext:
+    def __init__(self, task, db_path=TASKS_DB):
+        self.task_id = task['id']
+        self.payload = task['payload']
+        # Checkpoint saved by an earlier attempt of this task (None on the first attempt)
+        self.checkpoint_data = task['result']
+        self.db_path = db_path
+
+    def heartbeat(self):
+        with closing(connect(self.db_path)) as conn:
+            conn.execute("UPDATE tasks SET heartbeat_at = ? WHERE id = ?", (time.time(), self.task_id))
+
+    def cancelled(self):
+        with closing(connect(self.db_path)) as conn:
+            row = conn.execute("SELECT cancel_requested FROM tasks WHERE id = ?", (self.task_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def progress(self, fraction, message=''):
+        with closing(connect(self.db_path)) as conn:
+            conn.execute("UPDATE tasks SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                         (max(0.0, min(1.0, fraction)), message, time.time(), self.task_id))
+        if self.cancelled():
+            raise TaskCancelled()
+
+    def submit(self, kind, payload=None):
+        return submit(kind, payload, db_path=self.db_path)
+
+    # Persist partial results in the result column so a requeued attempt can skip finished work
+    def checkpoint(self, data):
+        self.checkpoint_data = data
+        with closing(connect(self.db_path)) as conn:
+            conn.execute("UPDATE tasks SET result = ?, heartbeat_at = ? WHERE id = ?", (json.dumps(data), time.time(), self.task_id))
+
+    # Queue the next step of payload['follow_up'], handing it the rest of the chain, so the steps run one after another
+    def submit_follow_up(self, store_file):
+        follow_up = list(self.payload.get('follow_up', []))
+        if not follow_up:
+            return {}
+        return {follow_up[0]: self.submit(follow_up[0], {'store_file': store_file, 'follow_up': follow_up[1:]})}
+
+def _finish(task_id, db_path, status, result=None, error=None, message=''):
+    with closing(connect(db_path)) as conn:
+        conn.execute(
+            "UPDATE tasks SET status = ?, result = ?, error = ?, message = ?, finished_at = ?, "
+            "progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, message, time.time(), status, task_id)
+        )
+
+def run_task(task, worker_id, db_path=TASKS_DB):
+    ctx = TaskContext(task, db_path)
+    # Heartbeats keep long steps without progress callbacks (e.g. embedding) from looking crashed
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            ctx.heartbeat()
+
+    beater = threading.Thread(target=beat, daemon=True)
+    beater.start()
+    try:
+        result = HANDLERS[task['kind']](ctx)
+        _finish(task['id'], db_path, 'done', result=result, message='Finished')
+    except TaskCancelled:
+        _finish(task['id'], db_path, 'cancelled', message='Cancelled')
+    except Exception as e:
+        _finish(task['id'], db_path, 'failed', error=f"{e}\n{traceback.format_exc()}", message='Failed')
+        with open('app/filter_log.txt', 'a') as f:
+            f.write(f"{datetime.now().isoformat()} - Task {task['id']} ({task['kind']}) failed on {worker_id}: {e}\n")
+    finally:
+        stop.set()
+        beater.join()
+
+def worker_loop(db_path=TASKS_DB, poll_interval=POLL_INTERVAL):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    start_exporters('worker')
+    while True:
+        task = claim_task(worker_id, db_path)
+        if task is None:
+            time.sleep(poll_interval)
+            continue
+        run_task(task, worker_id, db_path)
+
+# Keep num_workers worker processes alive, replacing any that die
+def run_workers(num_workers=2, db_path=TASKS_DB, poll_interval=POLL_INTERVAL):
+    workers = []
+    try:
+        while True:
+            workers = [worker for worker in workers if worker.is_alive()]
+            while len(workers) < num_workers:
+                worker = multiprocessing.Process(target=worker_loop, args=(db_path, poll_interval), daemon=True)
+                worker.start()
+                workers.append(worker)
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+# Task handlers: each receives a TaskContext and returns a JSON-serialisable result
+def run_scrape(ctx):
+    from scraper import batch_scrape
+    from job_store import JOBS_DB
+    jobs = batch_scrape(
+        companies_file=ctx.payload.get('companies_file', 'app/data/companies.json'),
+        batch_size=ctx.payload.get('batch_size', 10),
+        store_file=ctx.payload.get('store_file', JOBS_DB),
+        progress=ctx.progress
+    )
+    if not jobs:
+        raise RuntimeError("No jobs found. Check app/filter_log.txt and app/raw_jobs_log.txt.")
+    follow_up = ctx.submit_follow_up(ctx.payload.get('store_file', JOBS_DB))
+    return {'companies': len(jobs), 'jobs': sum(len(company_jobs) for company_jobs in jobs.values()), 'follow_up': follow_up}
+
+# Store locally extracted skills on every cached job so indexing can use them
+def run_enrich(ctx):
+    from job_store import load_all_jobs, save_job_skills, JOBS_DB
+    from skills import SkillExtractor
+    store_file = ctx.payload.get('store_file', JOBS_DB)
+    extractor = SkillExtractor()
+    jobs = [job for company_jobs in load_all_jobs(store_file, representatives_only=True).values() for job in company_jobs]
+    skills_by_job = {}
+    low_coverage = 0
+    for index, job in enumerate(jobs):
+        skills, confidence = extractor.extract(job.get('description', ''))
+        # Low-coverage matches are not stored, so the batch view still runs the LLM fallback for these jobs
+        if confidence < extractor.min_confidence:
+            skills = []
+            low_coverage += 1
+        skills_by_job[job['job_id']] = skills
+        if index % 50 == 0:
+            ctx.progress(index / max(1, len(jobs)), f"Extracted skills for {index} of {len(jobs)} jobs")
+    save_job_skills(skills_by_job, db_path=store_file)
+    # Indexing is queued only now, so it always embeds the skills saved above
+    return {'jobs': len(jobs), 'low_coverage': low_coverage, 'follow_up': ctx.submit_follow_up(store_file)}
+
+def run_index(ctx):
+    from preprocess import preprocess_and_embed
+    from job_store import JOBS_DB
+    ctx.progress(0.0, "Embedding jobs")
+    stats = preprocess_and_embed(jobs_file=ctx.payload.get('store_file', JOBS_DB)) or {}
+    ctx.progress(0.8, "Precomputing portfolio matches")
+    stats['matches'] = run_match(ctx)
+    stats['follow_up'] = ctx.submit_follow_up(ctx.payload.get('store_file', JOBS_DB))
+    return stats
+
+# Refresh the job-to-portfolio match table (after indexing or when portfolio.csv changes)
+def run_match(ctx):
+    from portfolio import Portfolio
+    from matches import precompute_matches
+    from job_store import JOBS_DB
+    portfolio = Portfolio(file_path=ctx.payload.get('portfolio_file', 'app/resource/portfolio.csv'))
+    return precompute_matches(portfolio, db_path=ctx.payload.get('store_file', JOBS_DB))
+
+# payload: {'emails': [{'to': ..., 'subject': ..., 'body': ...}, ...]}
+# Sent indices are checkpointed after every email, so a retry after a worker crash does not send them again
+def run_bulk_send(ctx):
+    from mailer import send_email
+    emails = ctx.payload.get('emails', [])
+    sent_indices = list((ctx.checkpoint_data or {}).get('sent_indices', []))
+    failures = []
+    for index, email in enumerate(emails):
+        if index in sent_indices:
+            continue
+        ctx.progress(index / max(1, len(emails)), f"Sending {index + 1} of {len(emails)}")
+        result = send_email(email['to'], email['subject'], email['body'])
+        if result == "Email sent successfully!":
+            sent_indices.append(index)
+            ctx.checkpoint({'sent_indices': sent_indices})
+        else:
+            failures.append({'index': index, 'to': email['to'], 'subject': email['subject'], 'error': result})
+    return {'sent': len(sent_indices), 'sent_indices': sent_indices, 'failed': failures}
+
+HANDLERS = {
+    'scrape': run_scrape,
+    'enrich': run_enrich,
+    'index': run_index,
+    'match': run_match,
+    'send': run_bulk_send,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background worker pool for scrape, enrichment, indexing and bulk-send tasks")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--db', default=TASKS_DB)
+    args = parser.parse_args()
+    print(f"Starting {args.workers} workers on {args.db}")
+    run_workers(args.workers, args.db)
@@ -0,0 +1,88 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from fetcher import PageFetcher
+
+PAGE = "<html><head><script>var x = 1;</script></head><body><h1>Data Engineer</h1><p>Python and SQL</p></body></html>"
+ETAG = '"job-v1"'
+
+# Local job board: /job serves an ETag and answers 304 on revalidation, /broken always fails
+class JobPageHandler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        JobPageHandler.requests_seen.append((self.path, self.headers.get('If-None-Match')))
+        if self.path == '/broken':
+            self.send_error(503)
+            return
+        if self.headers.get('If-None-Match') == ETAG:
+            self.send_response(304)
+            self.send_header('ETag', ETAG)
+            self.end_headers()
+            return
+        body = PAGE.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', ETAG)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def job_server():
+    JobPageHandler.requests_seen = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), JobPageHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher(tmp_path, monkeypatch):
+    # Error paths log to the relative app/filter_log.txt
+    monkeypatch.chdir(tmp_path)
+    os.makedirs('app')
+    return PageFetcher(cache_dir=str(tmp_path / 'http_cache'))
+
+def test_200_with_etag_is_cached(job_server, fetcher):
+    url = f"{job_server}/job"
+    [(fetched_url, text, error)] = fetcher.fetch_all([url])
+    assert (fetched_url, error) == (url, None)
+    assert "Data Engineer" in text and "Python and SQL" in text
+    assert "var x" not in text
+    assert fetcher.stats == {'hits': 0, 'misses': 1, 'errors': 0}
+    assert fetcher._load_cached(url)['etag'] == ETAG
+
+def test_304_revalidation_served_from_cache(job_server, fetcher):
+    url = f"{job_server}/job"
+    first = fetcher.fetch_all([url])
+    second = fetcher.fetch_all([url])
+    assert second == first
+    assert fetcher.stats == {'hits': 1, 'misses': 1, 'errors': 0}
+    assert JobPageHandler.requests_seen[-1] == ('/job', ETAG)
+
+def test_server_error_is_reported_not_raised(job_server, fetcher):
+    url = f"{job_server}/broken"
+    [(fetched_url, text, error)] = fetcher.fetch_all([url])
+    assert fetched_url == url and text == ""
+    assert "503" in error
+    assert fetcher.stats['errors'] == 1
+    assert fetcher._load_cached(url) is None
+    with open('app/filter_log.txt') as f:
+        assert url in f.read()
+
+def test_duplicate_urls_fetched_once(job_server, fetcher):
+    url = f"{job_server}/job"
+    pages = fetcher.fetch_all([url, url, f"{job_server}/broken", url])
+    assert sorted(page[0] for page in pages) == [f"{job_server}/broken", url]
+    assert [path for path, _ in JobPageHandler.requests_seen].count('/job') == 1